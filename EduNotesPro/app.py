@@ -18,7 +18,11 @@ mail = Mail()
 # Create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# Proxies in front of the app whose X-Forwarded-For entries are trusted as
+# the client address (used by the per-IP rate limits); set to 0 when
+# clients connect directly, or they can spoof their address
+app.config['PROXY_X_FOR'] = int(os.environ.get('PROXY_X_FOR', '1'))
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_X_FOR'], x_proto=1, x_host=1)
 
 # Configure the database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///edunotes.db")
@@ -29,9 +33,75 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # File upload configuration
-app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Upload storage backend: 'local' (sharded UPLOAD_FOLDER) or 's3' (any S3-compatible service, e.g. MinIO)
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'local')
+app.config['S3_BUCKET'] = os.environ.get('S3_BUCKET')
+app.config['S3_ENDPOINT_URL'] = os.environ.get('S3_ENDPOINT_URL')
+app.config['S3_PREFIX'] = os.environ.get('S3_PREFIX', 'uploads/')
+app.config['S3_PRESIGN_EXPIRY'] = int(os.environ.get('S3_PRESIGN_EXPIRY', '300'))  # seconds
+
+# Static asset pipeline and response compression
+app.config['ASSETS_FOLDER'] = os.path.join(app.root_path, 'static', 'dist')
+app.config['COMPRESS_MIN_SIZE'] = 500  # bytes
+app.config['COMPRESS_GZIP_LEVEL'] = 6
+app.config['COMPRESS_BROTLI_QUALITY'] = 4
+
+# "Related notes" recommender
+app.config['RECOMMENDATIONS_TOP_K'] = int(os.environ.get('RECOMMENDATIONS_TOP_K', '10'))
+app.config['RECOMMENDATIONS_SUBJECT_WEIGHT'] = float(os.environ.get('RECOMMENDATIONS_SUBJECT_WEIGHT', '0.5'))
+app.config['RECOMMENDATIONS_SEMESTER_WEIGHT'] = float(os.environ.get('RECOMMENDATIONS_SEMESTER_WEIGHT', '0.25'))
+
+# Trending scores
+app.config['TRENDING_HALF_LIFE_HOURS'] = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', '72'))
+app.config['TRENDING_DOWNLOAD_WEIGHT'] = 1.0
+app.config['TRENDING_RATING_WEIGHT'] = 2.0  # scaled by score / 5
+
+# Document text extraction
+app.config['EXTRACTION_WORKERS'] = int(os.environ.get('EXTRACTION_WORKERS', str(os.cpu_count() or 1)))  # extract backfill
+# Pool started inside each web worker for fresh uploads; kept small since
+# every gunicorn worker gets its own
+app.config['EXTRACTION_WEB_WORKERS'] = int(os.environ.get('EXTRACTION_WEB_WORKERS', '1'))
+app.config['EXTRACTION_TIME_LIMIT'] = int(os.environ.get('EXTRACTION_TIME_LIMIT', '30'))  # seconds per file
+app.config['EXTRACTION_MEMORY_LIMIT'] = int(os.environ.get('EXTRACTION_MEMORY_LIMIT', '1024')) * 1024 * 1024  # MB per worker
+app.config['EXTRACTION_MAX_CHARS'] = 1000000
+
+# Download log retention
+app.config['DOWNLOAD_RETENTION_DAYS'] = int(os.environ.get('DOWNLOAD_RETENTION_DAYS', '365'))
+app.config['DOWNLOAD_ARCHIVE_FOLDER'] = os.environ.get('DOWNLOAD_ARCHIVE_FOLDER', os.path.join('archive', 'downloads'))
+app.config['RETENTION_BATCH_SIZE'] = int(os.environ.get('RETENTION_BATCH_SIZE', '5000'))
+
+# Subject/semester ZIP bundles
+app.config['BUNDLE_CACHE_FOLDER'] = os.environ.get('BUNDLE_CACHE_FOLDER', 'bundle_cache')
+app.config['BUNDLE_CACHE_MAX_AGE'] = 3600  # seconds browsers may reuse a bundle
+
+# Admin data exports
+app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))  # rows fetched per round trip
+
+# Rate limiting (token buckets per IP, and also per user when logged in)
+app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
+app.config['RATELIMIT_BACKEND'] = os.environ.get('RATELIMIT_BACKEND', 'sqlite')  # memory, sqlite or redis
+app.config['RATELIMIT_SQLITE_PATH'] = os.environ.get('RATELIMIT_SQLITE_PATH')  # default: instance/ratelimit.db
+app.config['RATELIMIT_REDIS_URL'] = os.environ.get('RATELIMIT_REDIS_URL', 'redis://localhost:6379/0')
+# Burst size / refill period per endpoint; 'search' is view_notes with a search query
+app.config['RATELIMIT_RULES'] = os.environ.get('RATELIMIT_RULES', ';'.join([
+    'download_note=60/minute',
+    'download_bundle=10/minute',
+    'rate_note=20/minute',
+    'add_comment=10/minute',
+    'login=10/minute',
+    'admin_login=5/minute',
+    'search=30/minute',
+]))
+
+# Request profiling (admin capture mode, see profiler.py)
+app.config['PROFILER'] = os.environ.get('PROFILER', 'cprofile')  # cprofile or pyinstrument
+app.config['PROFILE_FOLDER'] = os.environ.get('PROFILE_FOLDER', 'profiles')
+app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', '20'))  # slowest requests kept
+app.config['PROFILE_ALL_REQUESTS'] = False  # set by "flask benchmark run --profile"
+
 # Email configuration
 app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
 app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', '587'))
@@ -44,8 +114,9 @@ app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER')
 db.init_app(app)
 mail.init_app(app)
 
-# Create upload directory if it doesn't exist
+# Create upload and bundle cache directories if they don't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['BUNDLE_CACHE_FOLDER'], exist_ok=True)
 
 with app.app_context():
     # Import models to ensure tables are created
@@ -94,4 +165,16 @@ with app.app_context():
         logging.info("Default subjects created")
 
 # Import routes after app initialization
+import schema
 import routes
+import assets
+import storage
+import recommendations
+import trending
+import extraction
+import retention
+import bulk_import
+import exports
+import ratelimit
+import profiler
+import benchmark
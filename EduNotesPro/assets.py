@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import gzip
+import hashlib
+import mimetypes
+import click
+from flask import request, url_for, send_from_directory, abort
+from flask.cli import AppGroup
+from app import app
+
+try:
+    import brotli
+except ImportError:  # A declared dependency; without it only gzip is used
+    brotli = None
+
+# Source files (relative to static/) that go through the build step
+ASSET_SOURCES = ['css/custom.css', 'js/main.js']
+
+# Response types worth compressing on the fly
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/plain', 'application/json'}
+
+# (mtime, manifest) of the manifest.json last read
+_manifest = None
+_manifest_warned = False
+
+def minify_css(source):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    return source.replace(';}', '}').strip()
+
+def minify_js(source):
+    """Drop comment-only lines, indentation and blank lines from a script.
+
+    Line breaks are kept so automatic semicolon insertion still works.
+    """
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+def fingerprint(filename, content):
+    """Return filename with a content hash inserted before the extension"""
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    base, ext = os.path.splitext(filename)
+    return f"{base}.{digest}{ext}"
+
+def precompress(path, content):
+    """Write .gz (and .br when available) siblings of a built asset"""
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+def build_assets():
+    """Minify, fingerprint and precompress static assets into ASSETS_FOLDER"""
+    global _manifest
+    output_folder = app.config['ASSETS_FOLDER']
+    manifest = {}
+
+    for source in ASSET_SOURCES:
+        with open(os.path.join(app.static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        minify = MINIFIERS.get(os.path.splitext(source)[1])
+        content = (minify(text) if minify else text).encode('utf-8')
+
+        built_name = fingerprint(source, content)
+        built_path = os.path.join(output_folder, built_name)
+        os.makedirs(os.path.dirname(built_path), exist_ok=True)
+        with open(built_path, 'wb') as f:
+            f.write(content)
+        precompress(built_path, content)
+        manifest[source] = built_name
+
+    with open(manifest_path(), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    _manifest = (os.stat(manifest_path()).st_mtime_ns, manifest)
+    return manifest
+
+def manifest_path():
+    return os.path.join(app.config['ASSETS_FOLDER'], 'manifest.json')
+
+def load_manifest():
+    """Load the asset manifest, or an empty one if assets were never built.
+
+    The manifest is re-read whenever manifest.json changes, and a missing
+    or unreadable one is never cached, so assets built after the app
+    started are picked up without a restart.
+    """
+    global _manifest
+    try:
+        mtime = os.stat(manifest_path()).st_mtime_ns
+        if _manifest is None or _manifest[0] != mtime:
+            with open(manifest_path()) as f:
+                _manifest = (mtime, json.load(f))
+    except (OSError, ValueError) as e:
+        warn_missing_manifest(e)
+        return {}
+    return _manifest[1]
+
+def warn_missing_manifest(error):
+    """Log once per process when production pages fall back to unbuilt assets"""
+    global _manifest_warned
+    if app.debug or _manifest_warned:
+        return
+    _manifest_warned = True
+    app.logger.error(f"Asset manifest unavailable ({error}); serving unminified static files. "
+                     f"Run 'flask --app main assets build'")
+
+def asset_url(filename):
+    """url_for for static assets that resolves fingerprinted build names.
+
+    Falls back to the plain static file when assets have not been built.
+    """
+    built_name = load_manifest().get(filename)
+    if built_name:
+        return url_for('asset', filename=built_name)
+    return url_for('static', filename=filename)
+
+app.jinja_env.globals['asset_url'] = asset_url
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    if filename not in load_manifest().values():
+        abort(404)
+
+    folder = app.config['ASSETS_FOLDER']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    # Pick the best precompressed variant the client accepts
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.exists(os.path.join(folder, filename + suffix)):
+            encoding = candidate
+            filename += suffix
+            break
+
+    response = send_from_directory(folder, filename, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress dynamic text responses when the client supports it"""
+    if (response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    if brotli is not None and request.accept_encodings['br']:
+        response.set_data(brotli.compress(data, quality=app.config['COMPRESS_BROTLI_QUALITY']))
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=app.config['COMPRESS_GZIP_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+assets_cli = AppGroup('assets', help='Static asset pipeline commands.')
+
+@assets_cli.command('build')
+def build_command():
+    """Minify, fingerprint and precompress static assets."""
+    if brotli is None:
+        click.echo("warning: brotli is not installed, so no .br files are built", err=True)
+    manifest = build_assets()
+    for source, built_name in sorted(manifest.items()):
+        click.echo(f"{source} -> {built_name}")
+
+app.cli.add_command(assets_cli)
@@ -0,0 +1,410 @@
+import io
+import json
+import time
+import uuid
+import random
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import click
+import numpy as np
+from flask.cli import AppGroup
+from sqlalchemy import event, insert, update, select
+from werkzeug.security import generate_password_hash
+from app import app, db
+from models import User, Note, Subject, Rating, Comment, Download, NoteText
+from storage import get_storage
+from trending import rebuild_trending_scores
+
+# Synthetic users are recognisable by this username prefix
+USERNAME_PREFIX = 'bench_'
+
+WORDS = ('algebra calculus matrix vector integral derivative theorem proof lemma graph tree heap '
+         'queue stack sorting hashing network protocol packet router circuit voltage current '
+         'resistor signal fourier laplace transform entropy enthalpy reaction molecule bond '
+         'organic polymer cell protein enzyme genome evolution market demand supply inflation '
+         'contract liability statistics probability variance regression sampling hypothesis '
+         'compiler parser grammar kernel process thread memory cache database index query').split()
+
+INSERT_BATCH_SIZE = 50000
+
+def sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+def make_pdf(lines):
+    """A small valid single-page PDF showing the given lines of text"""
+    text = ' '.join('({}) \''.format(line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)'))
+                    for line in lines)
+    stream = f"BT /F1 11 Tf 50 780 Td 14 TL {text} ET".encode('latin-1', 'replace')
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 5 0 R "
+        b"/Resources << /Font << /F1 4 0 R >> >> >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+    ]
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(pdf.tell())
+        pdf.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = pdf.tell()
+    pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        pdf.write(b"%010d 00000 n \n" % offset)
+    pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return pdf.getvalue()
+
+def zipf_weights(count, exponent, rng):
+    """Popularity weights where a few items dominate, in random item order"""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+def insert_rows(model, rows):
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + INSERT_BATCH_SIZE])
+
+def generate_dataset(users, notes, downloads, ratings, comments, days, seed, report=None):
+    """Fill the database with a reproducible synthetic dataset.
+
+    Popularity follows a Zipf-like curve, so a few subjects and notes get
+    most of the traffic. Every note gets a real PDF in storage and its
+    extracted text, so downloads and full-text search behave as in
+    production. Returns {phase: seconds}.
+    """
+    report = report or (lambda phase, seconds: None)
+    rng = np.random.default_rng(seed)
+    text_rng = random.Random(seed)
+    now = datetime.utcnow()
+    timings = {}
+
+    def phase(name, started):
+        timings[name] = time.perf_counter() - started
+        report(name, timings[name])
+
+    started = time.perf_counter()
+    password_hash = generate_password_hash('benchmark')
+    first = db.session.scalar(select(db.func.count(User.id)).where(User.username.like(f'{USERNAME_PREFIX}%')))
+    insert_rows(User, [{
+        'username': f'{USERNAME_PREFIX}{first + i}',
+        'email': f'{USERNAME_PREFIX}{first + i}@example.com',
+        'password_hash': password_hash,
+        'is_admin': False,
+        'is_blocked': False,
+        'created_at': now - timedelta(days=days * float(rng.random())),
+    } for i in range(users)])
+    db.session.commit()
+    user_ids = np.array(db.session.scalars(
+        select(User.id).where(User.username.like(f'{USERNAME_PREFIX}%')).order_by(User.id)).all())
+    phase('users', started)
+
+    started = time.perf_counter()
+    subject_ids = np.array(db.session.scalars(select(Subject.id).order_by(Subject.id)).all())
+    subject_weights = zipf_weights(len(subject_ids), 1.0, rng)
+    storage = get_storage()
+    last_note_id = db.session.scalar(select(db.func.max(Note.id))) or 0
+    note_rows, texts = [], []
+    for i in range(notes):
+        title = sentence(text_rng, 2, 6)
+        lines = [sentence(text_rng, 8, 14) for _ in range(text_rng.randint(10, 40))]
+        data = make_pdf([title] + lines)
+        filename = f"{uuid.UUID(int=text_rng.getrandbits(128)).hex}.pdf"
+        storage.save(io.BytesIO(data), filename)
+        content = ' '.join([title] + lines)
+        texts.append(content)
+        note_rows.append({
+            'title': title,
+            'description': sentence(text_rng, 5, 20),
+            'filename': filename,
+            'original_filename': f"{title.replace(' ', '_')}.pdf",
+            'file_size': len(data),
+            'semester': int(rng.integers(1, 9)),
+            'upload_date': now - timedelta(days=days * float(rng.random())),
+            'is_approved': bool(rng.random() < 0.9),
+            'download_count': 0,
+            'page_count': 1,
+            'word_count': len(content.split()),
+            'user_id': int(rng.choice(user_ids)),
+            'subject_id': int(rng.choice(subject_ids, p=subject_weights)),
+        })
+    insert_rows(Note, note_rows)
+    db.session.flush()
+    ids_by_filename = dict(db.session.execute(select(Note.filename, Note.id).where(Note.id > last_note_id)).all())
+    note_ids = np.array([ids_by_filename[row['filename']] for row in note_rows])
+    insert_rows(NoteText, [{'note_id': int(note_id), 'status': 'done', 'content': content, 'extracted_at': now}
+                           for note_id, content in zip(note_ids, texts)])
+    db.session.commit()
+    phase('notes', started)
+
+    # Only approved notes are downloaded and rated
+    approved = np.array([row['is_approved'] for row in note_rows])
+    approved_ids = note_ids[approved]
+    uploaded = np.array([row['upload_date'].timestamp() for row in note_rows])[approved]
+    note_weights = zipf_weights(len(approved_ids), 0.9, rng)
+    user_weights = zipf_weights(len(user_ids), 0.6, rng)
+
+    def sample_activity(size):
+        """Random (user, note, when) triples; events fall between upload and now"""
+        picks = rng.choice(len(approved_ids), size=size, p=note_weights)
+        users_picked = rng.choice(user_ids, size=size, p=user_weights)
+        when = uploaded[picks] + (now.timestamp() - uploaded[picks]) * rng.random(size)
+        return picks, users_picked, when
+
+    started = time.perf_counter()
+    counts = np.zeros(len(approved_ids), dtype=np.int64)
+    for start in range(0, downloads, INSERT_BATCH_SIZE):
+        size = min(INSERT_BATCH_SIZE, downloads - start)
+        picks, users_picked, when = sample_activity(size)
+        counts += np.bincount(picks, minlength=len(approved_ids))
+        db.session.execute(insert(Download), [
+            {'user_id': int(u), 'note_id': int(approved_ids[p]), 'download_date': datetime.fromtimestamp(w)}
+            for p, u, w in zip(picks, users_picked, when)])
+        db.session.commit()
+    db.session.execute(update(Note), [{'id': int(note_id), 'download_count': int(count)}
+                                      for note_id, count in zip(approved_ids, counts) if count])
+    db.session.commit()
+    phase('downloads', started)
+
+    started = time.perf_counter()
+    existing = set(db.session.execute(select(Rating.user_id, Rating.note_id)).all())
+    rating_rows = []
+    picks, users_picked, when = sample_activity(ratings)
+    for p, u, w in zip(picks, users_picked, when):
+        key = (int(u), int(approved_ids[p]))
+        if key in existing:
+            continue
+        existing.add(key)
+        rated_at = datetime.fromtimestamp(w)
+        rating_rows.append({
+            'user_id': key[0], 'note_id': key[1],
+            'score': int(rng.choice([1, 2, 3, 4, 5], p=[0.05, 0.07, 0.18, 0.35, 0.35])),
+            'comment': sentence(text_rng, 5, 25) if rng.random() < 0.4 else None,
+            'date': rated_at, 'created_at': rated_at,
+        })
+    insert_rows(Rating, rating_rows)
+    picks, users_picked, when = sample_activity(comments)
+    insert_rows(Comment, [{'user_id': int(u), 'note_id': int(approved_ids[p]),
+                           'content': sentence(text_rng, 5, 40), 'created_at': datetime.fromtimestamp(w)}
+                          for p, u, w in zip(picks, users_picked, when)])
+    db.session.commit()
+    phase('ratings+comments', started)
+
+    started = time.perf_counter()
+    rebuild_trending_scores()
+    phase('trending', started)
+    return timings
+
+class QueryCounter:
+    """Counts SQL statements per thread via an engine event listener"""
+
+    def __init__(self, engine):
+        self.local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self.on_execute)
+
+    def on_execute(self, *args):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self.local, 'count', 0)
+
+# Each scenario turns a random generator and the dataset into a request:
+# (method, url, form data, needs an admin session)
+
+def scenario_index(rng, data):
+    return 'GET', '/', None, False
+
+def scenario_view_notes(rng, data):
+    params = [f"sort={rng.choice(['newest', 'downloads', 'trending', 'rating'])}"]
+    if rng.random() < 0.6:
+        params.append(f"subject={rng.choice(data['subject_ids'])}")
+    if rng.random() < 0.5:
+        params.append(f"semester={rng.randint(1, 8)}")
+    if rng.random() < 0.3:
+        params.append(f"page={rng.randint(2, 5)}")
+    return 'GET', '/view_notes?' + '&'.join(params), None, False
+
+def scenario_search(rng, data):
+    return 'GET', f"/view_notes?search={rng.choice(WORDS)}&sort=newest", None, False
+
+def scenario_note_detail(rng, data):
+    return 'GET', f"/note/{rng.choice(data['note_ids'])}", None, False
+
+def scenario_download_note(rng, data):
+    return 'GET', f"/download/{rng.choice(data['note_ids'])}", None, False
+
+def scenario_rate_note(rng, data):
+    return 'POST', '/rate_note', {'note_id': rng.choice(data['note_ids']), 'score': rng.randint(1, 5)}, False
+
+def scenario_admin_analytics(rng, data):
+    return 'GET', '/admin/analytics', None, True
+
+# name: (builder, relative weight)
+SCENARIOS = {
+    'index': (scenario_index, 15),
+    'view_notes': (scenario_view_notes, 25),
+    'search': (scenario_search, 10),
+    'note_detail': (scenario_note_detail, 25),
+    'download_note': (scenario_download_note, 15),
+    'rate_note': (scenario_rate_note, 8),
+    'admin_analytics': (scenario_admin_analytics, 2),
+}
+
+def load_targets():
+    """Ids the scenarios pick from"""
+    note_ids = db.session.scalars(select(Note.id).where(Note.is_approved == True)).all()
+    user_ids = db.session.scalars(select(User.id).where(User.is_admin == False, User.is_blocked == False)).all()
+    admin_id = db.session.scalar(select(User.id).where(User.is_admin == True).limit(1))
+    subject_ids = db.session.scalars(select(Subject.id)).all()
+    if not note_ids or not user_ids:
+        raise click.ClickException('No approved notes or users; run "flask benchmark generate" first.')
+    return {'note_ids': note_ids, 'user_ids': user_ids, 'admin_id': admin_id, 'subject_ids': subject_ids}
+
+def build_plan(requests, scenarios, data, seed):
+    """The exact request sequence for a run, so runs with one seed are comparable"""
+    rng = random.Random(seed)
+    names = [name for name in scenarios if data['admin_id'] or name != 'admin_analytics']
+    weights = [SCENARIOS[name][1] for name in names]
+    plan = []
+    for _ in range(requests):
+        name = rng.choices(names, weights)[0]
+        plan.append((name,) + SCENARIOS[name][0](rng, data))
+    return plan
+
+def run_benchmark(plan, concurrency, data, seed):
+    """Replay the plan from concurrency threads; returns per-request samples"""
+    counter = QueryCounter(db.engine)
+    samples = []
+    lock = threading.Lock()
+    position = iter(range(len(plan)))
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        user_client = app.test_client()
+        with user_client.session_transaction() as s:
+            s['user_id'] = rng.choice(data['user_ids'])
+        admin_client = app.test_client()
+        if data['admin_id']:
+            with admin_client.session_transaction() as s:
+                s['user_id'] = data['admin_id']
+                s['is_admin'] = True
+
+        local = []
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None:
+                break
+            name, method, url, form, as_admin = plan[i]
+            client = admin_client if as_admin else user_client
+            counter.reset()
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=form)
+            response.get_data()  # Drain streamed bodies
+            response.close()
+            local.append((name, time.perf_counter() - started, response.status_code, counter.count))
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return samples, time.perf_counter() - started
+
+def summarize(samples, elapsed):
+    """Throughput, latency percentiles and SQL counts per scenario and overall"""
+    groups = {}
+    for name, duration, status, queries in samples:
+        groups.setdefault(name, []).append((duration, status, queries))
+    groups['all'] = [(d, s, q) for _, d, s, q in samples]
+
+    summary = {}
+    for name, rows in groups.items():
+        durations = np.array([row[0] for row in rows]) * 1000
+        queries = np.array([row[2] for row in rows])
+        summary[name] = {
+            'requests': len(rows),
+            'errors': sum(1 for row in rows if row[1] >= 400),
+            'throughput': len(rows) / elapsed,
+            'mean_ms': float(durations.mean()),
+            'p50_ms': float(np.percentile(durations, 50)),
+            'p99_ms': float(np.percentile(durations, 99)),
+            'max_ms': float(durations.max()),
+            'sql_mean': float(queries.mean()),
+            'sql_max': int(queries.max()),
+        }
+    return summary
+
+benchmark_cli = AppGroup('benchmark', help='Performance benchmark commands.')
+
+@benchmark_cli.command('generate')
+@click.option('--users', default=2000, help='Synthetic users.')
+@click.option('--notes', default=5000, help='Synthetic notes, each with a PDF file.')
+@click.option('--downloads', default=1000000, help='Synthetic download log rows.')
+@click.option('--ratings', default=50000, help='Synthetic ratings (duplicates per user/note are dropped).')
+@click.option('--comments', default=20000, help='Synthetic comments.')
+@click.option('--days', default=365, help='Spread activity over this many past days.')
+@click.option('--seed', default=42, help='Random seed; the same seed gives the same dataset.')
+@click.confirmation_option(prompt='This adds synthetic data to the configured database and storage. Continue?')
+def generate_command(users, notes, downloads, ratings, comments, days, seed):
+    """Fill the database with a synthetic dataset for benchmarking.
+
+    Point DATABASE_URL and UPLOAD_FOLDER (or S3_BUCKET, with
+    STORAGE_BACKEND=s3) at a scratch copy first.
+    """
+    click.echo(f"Generating {users} users, {notes} notes, {downloads} downloads, "
+               f"{ratings} ratings, {comments} comments (seed {seed})")
+    timings = generate_dataset(users, notes, downloads, ratings, comments, days, seed,
+                               report=lambda phase, seconds: click.echo(f"  {phase:<18} {seconds:8.1f}s"))
+    click.echo(f"Done in {sum(timings.values()):.1f}s")
+
+@benchmark_cli.command('run')
+@click.option('--requests', 'count', default=2000, help='Requests to send.')
+@click.option('--concurrency', default=4, help='Concurrent client threads.')
+@click.option('--scenario', 'scenarios', multiple=True, type=click.Choice(list(SCENARIOS)),
+              help='Only run these scenarios (repeatable; default: all, weighted).')
+@click.option('--warmup', default=50, help='Untimed requests sent first.')
+@click.option('--seed', default=42, help='Random seed; the same seed replays the same requests.')
+@click.option('--rate-limit', is_flag=True, help='Keep rate limiting on (off by default).')
+@click.option('--profile', is_flag=True, help='Profile every request and keep the slowest (see PROFILE_FOLDER).')
+@click.option('--json', 'json_path', type=click.Path(dir_okay=False, writable=True), help='Also write the report as JSON.')
+def run_command(count, concurrency, scenarios, warmup, seed, rate_limit, profile, json_path):
+    """Drive the main routes in-process and report latency, throughput and SQL counts.
+
+    Downloads and ratings write to the database, so run it against the
+    benchmark dataset rather than production.
+    """
+    app.config['RATELIMIT_ENABLED'] = rate_limit
+    data = load_targets()
+    scenarios = list(scenarios or SCENARIOS)
+
+    if warmup:
+        run_benchmark(build_plan(warmup, scenarios, data, seed + 1), concurrency, data, seed)
+    app.config['PROFILE_ALL_REQUESTS'] = profile
+    plan = build_plan(count, scenarios, data, seed)
+    samples, elapsed = run_benchmark(plan, concurrency, data, seed)
+    app.config['PROFILE_ALL_REQUESTS'] = False
+    summary = summarize(samples, elapsed)
+
+    click.echo(f"{count} requests, concurrency {concurrency}, {elapsed:.1f}s")
+    click.echo(f"{'scenario':<16} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>8} "
+               f"{'p99 ms':>8} {'max ms':>8} {'SQL/req':>8}")
+    for name, row in sorted(summary.items(), key=lambda item: item[0] == 'all'):
+        click.echo(f"{name:<16} {row['requests']:>6} {row['errors']:>6} {row['throughput']:>8.1f} "
+                   f"{row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} {row['sql_mean']:>8.1f}")
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'requests': count, 'concurrency': concurrency, 'seed': seed,
+                       'elapsed': elapsed, 'database': db.engine.url.render_as_string(hide_password=True),
+                       'notes': len(data['note_ids']), 'users': len(data['user_ids']),
+                       'scenarios': summary}, f, indent=2)
+        click.echo(f"Report written to {json_path}")
+
+app.cli.add_command(benchmark_cli)
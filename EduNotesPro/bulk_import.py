@@ -0,0 +1,219 @@
+import os
+import csv
+import time
+import uuid
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask.cli import AppGroup
+from app import app, db
+from models import User, Note, Subject
+from storage import get_storage
+from utils import allowed_file, format_file_size
+
+# Imported files are named after their content hash, which makes re-runs
+# idempotent: a file that was already imported maps to an existing Note.
+IMPORT_NAMESPACE = uuid.UUID('6f1c7a52-3d0e-4b8e-9a51-2f4c8d3b7e10')
+
+MANIFEST_COLUMNS = ('title', 'subject_code', 'semester', 'file_path')
+
+def read_manifest(path):
+    """Read CSV manifest rows: title, subject_code, semester, file_path[, description]
+
+    Rows that cannot be read are yielded with an error, so they are
+    reported with the other failures instead of aborting the import.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in MANIFEST_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise click.UsageError(f"Manifest {path} is missing column(s): {', '.join(missing)}")
+
+        for row in reader:
+            location = f"{os.path.basename(path)} line {reader.line_num}"
+            short = [column for column in MANIFEST_COLUMNS if row[column] is None]
+            if short:
+                yield {'path': location, 'error': f"row has no {', '.join(short)}"}
+                continue
+            file_path = row['file_path'].strip()
+            if not file_path:
+                yield {'path': location, 'error': 'missing file_path'}
+                continue
+            yield {
+                'title': row['title'].strip(),
+                'description': (row.get('description') or '').strip(),
+                'subject_code': row['subject_code'].strip(),
+                'semester': row['semester'].strip(),
+                'path': os.path.join(base, file_path),
+                'error': None,
+            }
+
+def scan_directory(directory, subject_code, semester):
+    """Manifest entries for every allowed file in a directory, titled by filename"""
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and allowed_file(name):
+            yield {
+                'title': os.path.splitext(name)[0].replace('_', ' ').strip(),
+                'description': '',
+                'subject_code': subject_code,
+                'semester': str(semester),
+                'path': path,
+            }
+
+def inspect_file(entry):
+    """Validate a manifest entry's file and compute its storage name"""
+    if entry.get('error'):
+        return entry
+    path = entry['path']
+    if not allowed_file(path):
+        return dict(entry, error='file type not allowed')
+    try:
+        size = os.path.getsize(path)
+        if size > app.config['MAX_CONTENT_LENGTH']:
+            return dict(entry, error=f'file too large ({format_file_size(size)})')
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except OSError as e:
+        return dict(entry, error=str(e))
+
+    extension = path.rsplit('.', 1)[1].lower()
+    filename = f"{uuid.uuid5(IMPORT_NAMESPACE, digest.hexdigest())}.{extension}"
+    return dict(entry, error=None, size=size, filename=filename)
+
+def copy_file(entry):
+    """Copy a validated file into storage unless an earlier run already did"""
+    storage = get_storage()
+    if not storage.exists(entry['filename']):
+        with open(entry['path'], 'rb') as f:
+            storage.save(f, entry['filename'])
+    return entry
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def import_notes(entries, uploader, approve=False, workers=8, batch_size=200, report=None):
+    """Import manifest entries as notes; returns a stats dict.
+
+    Files are validated, hashed and copied by a thread pool, and each
+    batch of notes is inserted in a single transaction.
+    """
+    subjects = {subject.code.upper(): subject.id for subject in Subject.query.all()}
+    stats = {'imported': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'errors': []}
+    started = time.perf_counter()
+
+    def fail(entry, error):
+        stats['failed'] += 1
+        stats['errors'].append(f"{entry['path']}: {error}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in batched(entries, batch_size):
+            candidates = []
+            for checked in executor.map(inspect_file, batch):
+                if checked['error']:
+                    fail(checked, checked['error'])
+                elif checked['subject_code'].upper() not in subjects:
+                    fail(checked, f"unknown subject code {checked['subject_code']!r}")
+                elif not checked['semester'].isdigit() or not 1 <= int(checked['semester']) <= 8:
+                    fail(checked, f"invalid semester {checked['semester']!r}")
+                elif not checked['title']:
+                    fail(checked, 'missing title')
+                else:
+                    candidates.append(checked)
+
+            # Skip files imported by an earlier run or repeated in this batch
+            names = [c['filename'] for c in candidates]
+            seen = {name for (name,) in db.session.query(Note.filename).filter(Note.filename.in_(names))}
+            new_entries = []
+            for checked in candidates:
+                if checked['filename'] in seen:
+                    stats['skipped'] += 1
+                else:
+                    seen.add(checked['filename'])
+                    new_entries.append(checked)
+
+            notes = []
+            futures = [(checked, executor.submit(copy_file, checked)) for checked in new_entries]
+            for checked, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    fail(checked, f"copy failed: {e}")
+                    continue
+                note = Note()
+                note.title = checked['title'][:200]
+                note.description = checked['description']
+                note.filename = checked['filename']
+                note.original_filename = os.path.basename(checked['path'])[:200]
+                note.file_size = checked['size']
+                note.semester = int(checked['semester'])
+                note.subject_id = subjects[checked['subject_code'].upper()]
+                note.user_id = uploader.id
+                note.is_approved = approve
+                notes.append(note)
+                stats['bytes'] += checked['size']
+
+            db.session.add_all(notes)
+            db.session.commit()
+            stats['imported'] += len(notes)
+
+            if report:
+                report(stats, time.perf_counter() - started)
+
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
+
+import_cli = AppGroup('notes', help='Note management commands.')
+
+@import_cli.command('import')
+@click.argument('manifest', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('--directory', type=click.Path(exists=True, file_okay=False), help='Import every file in a directory instead of a manifest.')
+@click.option('--subject', 'subject_code', help='Subject code for --directory imports.')
+@click.option('--semester', type=click.IntRange(1, 8), help='Semester for --directory imports.')
+@click.option('--uploader', default='admin@edunotes.com', help='Email of the user the notes are attributed to.')
+@click.option('--approve', is_flag=True, help='Mark imported notes as approved.')
+@click.option('--workers', default=8, help='Parallel file workers.')
+@click.option('--batch-size', default=200, help='Notes inserted per transaction.')
+def import_command(manifest, directory, subject_code, semester, uploader, approve, workers, batch_size):
+    """Bulk import notes from a CSV MANIFEST or a --directory of files.
+
+    The manifest needs title, subject_code, semester and file_path columns
+    (description is optional); relative paths are resolved against the
+    manifest's directory. Re-running an import skips files already imported.
+    """
+    if bool(manifest) == bool(directory):
+        raise click.UsageError('Give either a MANIFEST or --directory.')
+    if directory and not (subject_code and semester):
+        raise click.UsageError('--directory needs --subject and --semester.')
+
+    user = User.query.filter_by(email=uploader).first()
+    if not user:
+        raise click.UsageError(f'No user with email {uploader}.')
+
+    entries = list(read_manifest(manifest) if manifest else scan_directory(directory, subject_code, semester))
+    click.echo(f"Importing {len(entries)} files as {user.username}")
+
+    def report(stats, elapsed):
+        elapsed = max(elapsed, 1e-6)
+        done = stats['imported'] + stats['skipped'] + stats['failed']
+        click.echo(f"  {done}/{len(entries)}  imported {stats['imported']}, skipped {stats['skipped']}, "
+                   f"failed {stats['failed']}  ({done / elapsed:.1f} files/s, "
+                   f"{format_file_size(stats['bytes'] / elapsed)}/s)")
+
+    stats = import_notes(entries, user, approve, workers, batch_size, report)
+    for error in stats['errors']:
+        click.echo(f"  error: {error}", err=True)
+    click.echo(f"Imported {stats['imported']}, skipped {stats['skipped']}, failed {stats['failed']} "
+               f"in {stats['elapsed']:.1f}s")
+
+app.cli.add_command(import_cli)
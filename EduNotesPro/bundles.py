@@ -0,0 +1,132 @@
+import os
+import uuid
+import hashlib
+import zipfile
+from collections import namedtuple
+from contextlib import closing
+from app import app
+from storage import get_storage
+
+# Already-compressed formats are stored as-is; recompressing wastes CPU
+STORED_EXTENSIONS = {'pdf', 'docx'}
+
+CHUNK_SIZE = 256 * 1024
+
+# Plain copy of the Note fields a bundle needs, safe to use after commit
+BundleFile = namedtuple('BundleFile', ['id', 'filename', 'original_filename', 'file_size', 'upload_date'])
+
+def bundle_files(notes):
+    return [BundleFile(note.id, note.filename, note.original_filename, note.file_size, note.upload_date)
+            for note in notes]
+
+class StreamSink:
+    """Write-only, unseekable file object that collects bytes for streaming.
+
+    zipfile detects the missing seek() and writes data descriptors instead
+    of going back to patch local headers, so nothing is buffered beyond the
+    current chunk.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def bundle_etag(files):
+    """Strong ETag: the archive bytes depend only on these fields"""
+    digest = hashlib.sha256()
+    for f in files:
+        digest.update(f"{f.id}:{f.filename}:{f.file_size}:{f.original_filename}:{f.upload_date}\n".encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+def archive_names(files):
+    """Unique names inside the ZIP, based on the original filenames"""
+    used = set()
+    for note in files:
+        base, ext = os.path.splitext(os.path.basename(note.original_filename) or note.filename)
+        name, counter = base + ext, 2
+        while name.lower() in used:
+            name = f"{base} ({counter}){ext}"
+            counter += 1
+        used.add(name.lower())
+        yield note, name
+
+def stream_zip(files, cache_path=None):
+    """Yield a ZIP of the given BundleFiles chunk by chunk in constant memory.
+
+    When cache_path is given the archive is also written there, and only
+    moved into place once complete.
+    """
+    storage = get_storage()
+    sink = StreamSink()
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp" if cache_path else None
+    cache_file = open(tmp_path, 'wb') if cache_path else None
+
+    def drain():
+        data = sink.pop()
+        if data:
+            if cache_file:
+                cache_file.write(data)
+            yield data
+
+    try:
+        with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+            for note, name in archive_names(files):
+                try:
+                    source = storage.open(note.filename)
+                except Exception as e:
+                    app.logger.error(f"Skipping note {note.id} in bundle: {e}")
+                    continue
+
+                info = zipfile.ZipInfo(name, date_time=note.upload_date.timetuple()[:6])
+                extension = note.filename.rsplit('.', 1)[-1].lower()
+                if extension in STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                info.file_size = note.file_size or 0
+
+                with closing(source), archive.open(info, 'w', force_zip64=info.file_size > 2 ** 31) as entry:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                        entry.write(chunk)
+                        yield from drain()
+                yield from drain()
+        yield from drain()
+
+        if cache_file:
+            cache_file.close()
+            os.replace(tmp_path, cache_path)
+    finally:
+        if cache_file and not cache_file.closed:
+            # Client went away mid-download; drop the partial cache file
+            cache_file.close()
+            os.remove(tmp_path)
+
+def cache_path_for(subject_id, semester, etag):
+    # Absolute, since send_file resolves relative paths against the app root
+    folder = os.path.abspath(app.config['BUNDLE_CACHE_FOLDER'])
+    return os.path.join(folder, f"{subject_id}-{semester}-{etag}.zip")
+
+def prune_cache(subject_id, semester, keep):
+    """Remove cached bundles for this subject/semester other than keep"""
+    folder = os.path.dirname(keep)
+    prefix = f"{subject_id}-{semester}-"
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.startswith(prefix) and path != keep and not name.endswith('.tmp'):
+            os.remove(path)
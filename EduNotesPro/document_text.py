@@ -0,0 +1,124 @@
+# Text extraction for uploaded documents. This module runs inside the
+# extraction worker processes, so it must not import the app or models.
+import io
+import re
+import signal
+import zipfile
+import unicodedata
+import xml.etree.ElementTree as ET
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; limits are skipped there
+    resource = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF extraction needs pypdf
+    PdfReader = None
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+APP_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/extended-properties}'
+
+class ExtractionTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout('time limit exceeded')
+
+def address_space_size():
+    """Current virtual memory size of this process in bytes (Linux only)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError):
+        return 0
+
+def init_worker(memory_bytes):
+    """Process pool initializer: cap the memory a worker may add.
+
+    Workers are forked from the app process, so the limit is on top of the
+    address space they inherit.
+    """
+    if resource is not None and memory_bytes:
+        limit = address_space_size() + memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _raise_timeout)
+    signal.signal(signal.SIGALRM, _raise_timeout)
+
+def normalize_text(text):
+    """Unicode-normalize text and collapse whitespace for searching"""
+    text = unicodedata.normalize('NFKC', text)
+    text = ''.join(ch if ch.isprintable() or ch.isspace() else ' ' for ch in text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def extract_pdf(data):
+    if PdfReader is None:
+        raise RuntimeError('PDF extraction requires the pypdf package')
+    reader = PdfReader(io.BytesIO(data))
+    pages = [page.extract_text() or '' for page in reader.pages]
+    return '\n'.join(pages), len(reader.pages)
+
+def extract_docx(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        paragraphs = []
+        with archive.open('word/document.xml') as f:
+            for _, element in ET.iterparse(f):
+                if element.tag == WORD_NS + 'p':
+                    paragraphs.append(''.join(t.text or '' for t in element.iter(WORD_NS + 't')))
+                    element.clear()
+
+        page_count = None
+        if 'docProps/app.xml' in archive.namelist():
+            pages = ET.fromstring(archive.read('docProps/app.xml')).find(APP_NS + 'Pages')
+            if pages is not None and (pages.text or '').isdigit():
+                page_count = int(pages.text)
+    return '\n'.join(paragraphs), page_count
+
+def extract_doc(data):
+    """Best-effort text from legacy binary .doc files.
+
+    Word stores text as either 8-bit or UTF-16LE runs; keep whichever
+    decoding yields more readable words.
+    """
+    candidates = [
+        ' '.join(re.findall(r'[\x20-\x7e]{4,}', data.decode('latin-1'))),
+        ' '.join(re.findall(r'[\w .,;:!?()\'"-]{4,}', data.decode('utf-16-le', errors='ignore'))),
+    ]
+    return max(candidates, key=lambda text: len(re.findall(r'[A-Za-z]{3,}', text))), None
+
+EXTRACTORS = {'pdf': extract_pdf, 'docx': extract_docx, 'doc': extract_doc}
+
+def extract_document(extension, data, time_limit=30, max_chars=None):
+    """Extract normalized text from a document within a time limit.
+
+    Returns a dict with status ('done' or 'failed'), content, page_count,
+    word_count and error.
+    """
+    if resource is not None:
+        # RLIMIT_CPU is cumulative per process, so extend it from current usage
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + time_limit
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    signal.alarm(time_limit)
+    try:
+        text, page_count = EXTRACTORS[extension.lower()](data)
+        content = normalize_text(text)
+        return {
+            'status': 'done',
+            'content': content[:max_chars] if max_chars else content,
+            'page_count': page_count,
+            'word_count': len(content.split()),
+            'error': None,
+        }
+    except Exception as e:  # Includes MemoryError from RLIMIT_AS and timeouts
+        return {'status': 'failed', 'content': None, 'page_count': None,
+                'word_count': None, 'error': f"{type(e).__name__}: {e}"[:500]}
+    finally:
+        signal.alarm(0)
+        if resource is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
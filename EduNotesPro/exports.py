@@ -0,0 +1,254 @@
+import io
+import csv
+import json
+from datetime import datetime, date, timedelta
+import click
+from flask import request, session, abort, Response, stream_with_context
+from flask.cli import AppGroup
+from sqlalchemy import or_, func
+from app import app, db
+from models import User, Note, Subject, Rating, Download
+from retention import read_archived_downloads
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# CSV output is handed to the client in chunks of this many rows
+FLUSH_ROWS = 500
+
+# Spreadsheets treat cells starting with these as formulas, so user text
+# such as a note title is escaped with a leading quote in CSV output
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Filters shared by the admin pages and the exports, so both always agree
+
+def filter_notes(status='', subject_id='', search=''):
+    query = Note.query
+    if status == 'approved':
+        query = query.filter_by(is_approved=True)
+    elif status == 'pending':
+        query = query.filter_by(is_approved=False)
+
+    if subject_id:
+        query = query.filter_by(subject_id=subject_id)
+
+    if search:
+        query = query.filter(or_(
+            Note.title.contains(search),
+            Note.description.contains(search)
+        ))
+    return query
+
+def filter_users(status='', search=''):
+    query = User.query
+    if status == 'blocked':
+        query = query.filter_by(is_blocked=True)
+    elif status == 'active':
+        query = query.filter_by(is_blocked=False)
+    elif status == 'admin':
+        query = query.filter_by(is_admin=True)
+
+    if search:
+        query = query.filter(or_(
+            User.username.contains(search),
+            User.email.contains(search)
+        ))
+    return query
+
+def filter_ratings(comments_only=False):
+    query = Rating.query
+    if comments_only:
+        query = query.filter(Rating.comment.isnot(None))
+    return query
+
+def filter_downloads(since=None, until=None):
+    query = Download.query
+    if since:
+        query = query.filter(Download.download_date >= since)
+    if until:
+        query = query.filter(Download.download_date < until)
+    return query
+
+# Each export returns (columns, rows). Rows are plain tuples selected
+# column by column and fetched yield_per rows at a time, so no ORM objects
+# pile up in the session however large the table is.
+
+def export_notes(status='', subject_id='', search=''):
+    ratings = db.session.query(
+        Rating.note_id,
+        func.count(Rating.id).label('rating_count'),
+        func.avg(Rating.score).label('average_rating')
+    ).group_by(Rating.note_id).subquery()
+
+    query = filter_notes(status, subject_id, search) \
+        .join(Subject, Note.subject_id == Subject.id) \
+        .join(User, Note.user_id == User.id) \
+        .outerjoin(ratings, ratings.c.note_id == Note.id) \
+        .with_entities(Note.id, Note.title, Subject.code, Note.semester, User.username,
+                       Note.is_approved, Note.download_count, ratings.c.rating_count,
+                       ratings.c.average_rating, Note.file_size, Note.page_count,
+                       Note.word_count, Note.original_filename, Note.upload_date) \
+        .order_by(Note.id)
+    columns = ['id', 'title', 'subject_code', 'semester', 'author', 'is_approved', 'download_count',
+               'rating_count', 'average_rating', 'file_size', 'page_count', 'word_count',
+               'original_filename', 'upload_date']
+    return columns, stream_query(query)
+
+def export_users(status='', search=''):
+    query = filter_users(status, search) \
+        .with_entities(User.id, User.username, User.email, User.is_admin, User.is_blocked, User.created_at) \
+        .order_by(User.id)
+    return ['id', 'username', 'email', 'is_admin', 'is_blocked', 'created_at'], stream_query(query)
+
+def export_ratings(comments_only=False):
+    query = filter_ratings(comments_only) \
+        .join(User, Rating.user_id == User.id) \
+        .with_entities(Rating.id, Rating.note_id, Rating.user_id, User.username,
+                       Rating.score, Rating.comment, Rating.date) \
+        .order_by(Rating.id)
+    return ['id', 'note_id', 'user_id', 'username', 'score', 'comment', 'date'], stream_query(query)
+
+def export_downloads(since=None, until=None, include_archived=False):
+    query = filter_downloads(since, until) \
+        .with_entities(Download.id, Download.user_id, Download.note_id, Download.download_date) \
+        .order_by(Download.id)
+
+    def rows():
+        if include_archived:
+            # Archived rows are all older than the live ones
+            for row in read_archived_downloads(since, until):
+                yield row['id'], row['user_id'], row['note_id'], row['download_date']
+        yield from stream_query(query)
+
+    return ['id', 'user_id', 'note_id', 'download_date'], rows()
+
+EXPORTS = {
+    'notes': export_notes,
+    'users': export_users,
+    'ratings': export_ratings,
+    'downloads': export_downloads,
+}
+
+def stream_query(query):
+    yield from query.yield_per(app.config['EXPORT_BATCH_SIZE'])
+
+def to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def write_csv(columns, rows):
+    """Yield CSV text a few hundred rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([csv_value(value) for value in row])
+        if count % FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def write_ndjson(columns, rows):
+    """Yield one JSON object per line"""
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), default=to_json) + '\n'
+
+WRITERS = {'csv': write_csv, 'ndjson': write_ndjson}
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+def request_filters(dataset):
+    """Export filters from the query string, named like the admin pages' own"""
+    args = request.args
+    if dataset == 'notes':
+        return {'status': args.get('status', ''), 'subject_id': args.get('subject', ''),
+                'search': args.get('search', '')}
+    if dataset == 'users':
+        return {'status': args.get('status', ''), 'search': args.get('search', '')}
+    if dataset == 'ratings':
+        return {'comments_only': args.get('comments') == 'only'}
+    try:
+        until = parse_date(args.get('until'))
+        return {'since': parse_date(args.get('since')),
+                'until': until + timedelta(days=1) if until else None,
+                'include_archived': args.get('archived') == '1'}
+    except ValueError:
+        abort(400)
+
+@app.route('/admin/export/<dataset>.<fmt>')
+def admin_export(dataset, fmt):
+    if 'user_id' not in session or not session.get('is_admin'):
+        abort(403)
+    if dataset not in EXPORTS or fmt not in FORMATS:
+        abort(404)
+
+    columns, rows = EXPORTS[dataset](**request_filters(dataset))
+    filename = f"{dataset}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    response = Response(stream_with_context(WRITERS[fmt](columns, rows)), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+export_cli = AppGroup('export', help='Data export commands.')
+
+def export_options(command):
+    command = click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='csv',
+                           help='Output format.')(command)
+    command = click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+                           help='Output file (default: stdout).')(command)
+    return command
+
+def write_export(dataset, fmt, output, **filters):
+    columns, rows = EXPORTS[dataset](**filters)
+    for chunk in WRITERS[fmt](columns, rows):
+        output.write(chunk)
+    output.flush()
+
+@export_cli.command('notes')
+@export_options
+@click.option('--status', type=click.Choice(['approved', 'pending']), default=None)
+@click.option('--subject', 'subject_id', type=int, default=None, help='Subject id.')
+@click.option('--search', default='')
+def export_notes_command(fmt, output, status, subject_id, search):
+    """Export notes with author, subject and rating summary."""
+    write_export('notes', fmt, output, status=status or '', subject_id=subject_id or '', search=search)
+
+@export_cli.command('users')
+@export_options
+@click.option('--status', type=click.Choice(['active', 'blocked', 'admin']), default=None)
+@click.option('--search', default='')
+def export_users_command(fmt, output, status, search):
+    """Export user accounts (without credentials)."""
+    write_export('users', fmt, output, status=status or '', search=search)
+
+@export_cli.command('ratings')
+@export_options
+@click.option('--comments-only', is_flag=True, help='Only ratings with a comment, as on the feedback page.')
+def export_ratings_command(fmt, output, comments_only):
+    """Export ratings and feedback comments."""
+    write_export('ratings', fmt, output, comments_only=comments_only)
+
+@export_cli.command('downloads')
+@export_options
+@click.option('--since', type=click.DateTime(['%Y-%m-%d']), default=None, help='First day to include.')
+@click.option('--until', type=click.DateTime(['%Y-%m-%d']), default=None, help='Last day to include.')
+@click.option('--include-archived', is_flag=True, help='Also export downloads moved to the retention archive.')
+def export_downloads_command(fmt, output, since, until, include_archived):
+    """Export the download log."""
+    until = until + timedelta(days=1) if until else None
+    write_export('downloads', fmt, output, since=since, until=until, include_archived=include_archived)
+
+app.cli.add_command(export_cli)
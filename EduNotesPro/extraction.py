@@ -0,0 +1,149 @@
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import click
+from flask.cli import AppGroup
+from sqlalchemy import or_
+from app import app, db
+from models import Note, NoteText
+from storage import get_storage
+from document_text import extract_document, init_worker
+
+def create_executor(workers=None):
+    """Process pool for text extraction; each worker caps its own memory"""
+    return ProcessPoolExecutor(max_workers=workers or app.config['EXTRACTION_WORKERS'],
+                               initializer=init_worker,
+                               initargs=(app.config['EXTRACTION_MEMORY_LIMIT'],))
+
+def get_executor():
+    """Per-process pool used for extracting freshly uploaded notes"""
+    if 'extraction_executor' not in app.extensions:
+        app.extensions['extraction_executor'] = create_executor(app.config['EXTRACTION_WEB_WORKERS'])
+    return app.extensions['extraction_executor']
+
+def file_extension(note):
+    return note.filename.rsplit('.', 1)[-1].lower()
+
+def read_note_file(note):
+    with get_storage().open(note.filename) as f:
+        return f.read()
+
+def submit_extraction(executor, note):
+    return executor.submit(extract_document, file_extension(note), read_note_file(note),
+                           app.config['EXTRACTION_TIME_LIMIT'], app.config['EXTRACTION_MAX_CHARS'])
+
+def store_result(note_id, result):
+    """Save an extraction result for a note (caller commits)"""
+    note = db.session.get(Note, note_id)
+    if note is None:
+        return
+    note_text = note.extracted_text or NoteText(note_id=note_id)
+    note_text.status = result['status']
+    note_text.content = result['content']
+    note_text.error = result['error']
+    note_text.extracted_at = datetime.utcnow()
+    db.session.add(note_text)
+    note.page_count = result['page_count']
+    note.word_count = result['word_count']
+    if result['status'] != 'done':
+        app.logger.warning(f"Text extraction failed for note {note_id}: {result['error']}")
+
+def extract_in_background(note):
+    """Queue text extraction for a newly uploaded note"""
+    note_id = note.id
+    future = submit_extraction(get_executor(), note)
+
+    def on_done(future):
+        with app.app_context():
+            try:
+                store_result(note_id, future.result())
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Failed to store extracted text for note {note_id}: {e}")
+
+    future.add_done_callback(on_done)
+
+def pending_notes(after_id, limit, retry_failed=False):
+    """Notes after after_id without extracted text, in id order"""
+    query = Note.query.outerjoin(NoteText).filter(Note.id > after_id)
+    if retry_failed:
+        query = query.filter(or_(NoteText.note_id.is_(None), NoteText.status != 'done'))
+    else:
+        query = query.filter(NoteText.note_id.is_(None))
+    return query.order_by(Note.id).limit(limit).all()
+
+def backfill(workers, batch_size=100, retry_failed=False, limit=None):
+    """Extract text for every note that has none, committing per batch.
+
+    Safe to interrupt: finished batches are committed and skipped on the
+    next run, as are notes whose file could not be read or whose worker
+    crashed in this run. Returns (done, failed, elapsed seconds).
+    """
+    done = failed = 0
+    last_id = 0
+    started = time.perf_counter()
+    executor = create_executor(workers)
+    try:
+        while limit is None or done + failed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - done - failed)
+            batch = pending_notes(last_id, size, retry_failed)
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            # Keep a bounded number of files in flight so memory stays flat
+            queue = list(batch)
+            in_flight = {}
+            while queue or in_flight:
+                while queue and len(in_flight) < workers * 2:
+                    note = queue.pop(0)
+                    try:
+                        in_flight[submit_extraction(executor, note)] = note.id
+                    except Exception as e:
+                        app.logger.error(f"Cannot read file for note {note.id}: {e}")
+                if not in_flight:
+                    continue
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    note_id = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        # A worker died outright, which breaks the whole pool;
+                        # its in-flight notes are left for the next run
+                        app.logger.error(f"Extraction worker crashed near note {note_id}")
+                        in_flight.clear()
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = create_executor(workers)
+                        break
+                    store_result(note_id, result)
+                    if result['status'] == 'done':
+                        done += 1
+                    else:
+                        failed += 1
+
+            db.session.commit()
+            app.logger.info(f"Extracted {done + failed} documents (up to note {last_id})")
+    finally:
+        executor.shutdown(wait=True)
+    return done, failed, time.perf_counter() - started
+
+extract_cli = AppGroup('extract', help='Document text extraction commands.')
+
+@extract_cli.command('backfill')
+@click.option('--workers', default=None, type=int, help='Worker processes (default: EXTRACTION_WORKERS).')
+@click.option('--batch-size', default=100, help='Notes per committed batch.')
+@click.option('--retry-failed', is_flag=True, help='Also retry notes whose extraction failed.')
+@click.option('--limit', default=None, type=int, help='Stop after this many documents.')
+def backfill_command(workers, batch_size, retry_failed, limit):
+    """Extract searchable text for existing uploads."""
+    workers = workers or app.config['EXTRACTION_WORKERS']
+    done, failed, elapsed = backfill(workers, batch_size, retry_failed, limit)
+    total = done + failed
+    rate = total / elapsed if elapsed else 0
+    click.echo(f"Extracted {done} documents ({failed} failed) in {elapsed:.1f}s")
+    click.echo(f"Throughput: {rate:.1f} docs/s, {rate / workers:.1f} docs/s per core ({workers} workers)")
+
+app.cli.add_command(extract_cli)
@@ -44,15 +44,26 @@ class Note(db.Model):
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     is_approved = db.Column(db.Boolean, default=False)
     download_count = db.Column(db.Integer, default=0)
+    trending_score = db.Column(db.Float)  # log2 of decayed activity, see trending.py
+    page_count = db.Column(db.Integer)  # Filled in by text extraction
+    word_count = db.Column(db.Integer)
     
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
     
+    # Serves "trending" top-N queries without scanning
+    __table_args__ = (db.Index('ix_note_approved_trending', 'is_approved', 'trending_score'),)
+    
     # Relationships
     ratings = db.relationship('Rating', backref='note', lazy=True, cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='note', lazy=True, cascade='all, delete-orphan')
     downloads = db.relationship('Download', backref='note', lazy=True, cascade='all, delete-orphan')
+    recommendations = db.relationship('NoteRecommendation', foreign_keys='NoteRecommendation.note_id',
+                                      lazy=True, cascade='all, delete-orphan')
+    recommended_in = db.relationship('NoteRecommendation', foreign_keys='NoteRecommendation.related_note_id',
+                                     backref='related_note', lazy=True, cascade='all, delete-orphan')
+    extracted_text = db.relationship('NoteText', backref='note', uselist=False, cascade='all, delete-orphan')
 
     def average_rating(self):
         ratings_list = list(self.ratings)
@@ -88,8 +99,30 @@ class Comment(db.Model):
 
 class Download(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    download_date = db.Column(db.DateTime, default=datetime.utcnow)
+    download_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     note_id = db.Column(db.Integer, db.ForeignKey('note.id'), nullable=False)
+
+class NoteRecommendation(db.Model):
+    """Precomputed "related notes" built from download co-occurrence"""
+    id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, nullable=False)  # 1 = most related
+    score = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Foreign Keys
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id'), nullable=False)
+    related_note_id = db.Column(db.Integer, db.ForeignKey('note.id'), nullable=False)
+
+    # One row per rank per note; also serves the note_detail lookup
+    __table_args__ = (db.UniqueConstraint('note_id', 'rank', name='unique_note_recommendation_rank'),)
+
+class NoteText(db.Model):
+    """Normalized text extracted from a note's file, used for search"""
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False)  # done / failed
+    content = db.Column(db.Text)
+    error = db.Column(db.String(500))
+    extracted_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,158 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import threading
+from datetime import datetime
+from flask import request, session, g, render_template, redirect, url_for, flash, abort, send_file
+from app import app
+
+try:
+    from pyinstrument import Profiler as InstrumentProfiler
+except ImportError:  # Falls back to cProfile
+    InstrumentProfiler = None
+
+# Profiles are named <duration>ms-<endpoint>-<timestamp>.<ext>; the zero
+# padded duration makes the slowest sort last
+PROFILE_EXTENSIONS = ('.prof', '.html')
+
+# Only one profiler may be active per process on Python 3.12+, so at most
+# one request is profiled at a time; concurrent requests go unprofiled
+_profiling_lock = threading.Lock()
+
+def profile_folder():
+    return os.path.abspath(app.config['PROFILE_FOLDER'])
+
+def use_pyinstrument():
+    return app.config['PROFILER'] == 'pyinstrument' and InstrumentProfiler is not None
+
+def profiling_enabled():
+    endpoint = request.endpoint or ''
+    # Decided before touching the session: reading it adds Vary: Cookie,
+    # which would stop shared caches from storing immutable assets
+    if endpoint in ('asset', 'static') or endpoint.startswith('admin_profile'):
+        return False
+    if app.config['PROFILE_ALL_REQUESTS']:
+        return True
+    return session.get('is_admin') and session.get('profiling')
+
+def saved_profiles():
+    """Saved profile file names, slowest first"""
+    folder = profile_folder()
+    if not os.path.isdir(folder):
+        return []
+    return sorted((name for name in os.listdir(folder) if name.endswith(PROFILE_EXTENSIONS)), reverse=True)
+
+def parse_profile_name(name):
+    duration, endpoint, rest = name.split('-', 2)
+    stamp = rest.rsplit('.', 1)[0]
+    return {'name': name, 'duration_ms': float(duration[:-2]), 'endpoint': endpoint,
+            'captured_at': datetime.strptime(stamp, '%Y%m%d%H%M%S%f')}
+
+def save_profile(profiler, duration):
+    """Keep this request's profile if it is among the PROFILE_KEEP slowest"""
+    keep = app.config['PROFILE_KEEP']
+    existing = saved_profiles()
+    duration_ms = duration * 1000
+    if len(existing) >= keep and duration_ms <= parse_profile_name(existing[keep - 1])['duration_ms']:
+        return
+
+    os.makedirs(profile_folder(), exist_ok=True)
+    endpoint = (request.endpoint or 'unknown').replace('-', '_')
+    stem = f"{duration_ms:09.1f}ms-{endpoint}-{datetime.utcnow():%Y%m%d%H%M%S%f}"
+    if InstrumentProfiler is not None and isinstance(profiler, InstrumentProfiler):
+        with open(os.path.join(profile_folder(), stem + '.html'), 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.dump_stats(os.path.join(profile_folder(), stem + '.prof'))
+
+    for name in saved_profiles()[keep:]:
+        try:
+            os.remove(os.path.join(profile_folder(), name))
+        except FileNotFoundError:  # Another worker pruned it first
+            pass
+
+@app.before_request
+def start_profiler():
+    if not profiling_enabled() or not _profiling_lock.acquire(blocking=False):
+        return
+    try:
+        if use_pyinstrument():
+            profiler = InstrumentProfiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+    except Exception as e:  # e.g. another profiling tool is active
+        _profiling_lock.release()
+        app.logger.warning(f"Could not start profiler for {request.path}: {e}")
+        return
+    g.profile_started = time.perf_counter()
+    g.profiler = profiler
+
+@app.teardown_request
+def stop_profiler(exception=None):
+    # Teardown runs after streamed bodies are sent, so they are included
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    duration = time.perf_counter() - g.profile_started
+    try:
+        if InstrumentProfiler is not None and isinstance(profiler, InstrumentProfiler):
+            profiler.stop()
+        else:
+            profiler.disable()
+    finally:
+        _profiling_lock.release()
+    try:
+        save_profile(profiler, duration)
+    except Exception as e:
+        app.logger.error(f"Could not save profile for {request.path}: {e}")
+
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+def admin_profiler():
+    if 'user_id' not in session or not session.get('is_admin'):
+        abort(403)
+
+    if request.method == 'POST':
+        action = request.form.get('action')
+        if action == 'start':
+            session['profiling'] = True
+            flash('Profiling enabled for your requests.', 'success')
+        elif action == 'stop':
+            session.pop('profiling', None)
+            flash('Profiling disabled.', 'success')
+        elif action == 'clear':
+            for name in saved_profiles():
+                os.remove(os.path.join(profile_folder(), name))
+            flash('Saved profiles deleted.', 'success')
+        return redirect(url_for('admin_profiler'))
+
+    profiles = [parse_profile_name(name) for name in saved_profiles()]
+    return render_template('admin/profiler.html',
+                         profiles=profiles,
+                         profiling=session.get('profiling', False),
+                         profiler_name='pyinstrument' if use_pyinstrument() else 'cProfile',
+                         keep=app.config['PROFILE_KEEP'])
+
+@app.route('/admin/profiler/<name>')
+def admin_profile_detail(name):
+    if 'user_id' not in session or not session.get('is_admin'):
+        abort(403)
+    if name not in saved_profiles():
+        abort(404)
+
+    path = os.path.join(profile_folder(), name)
+    if name.endswith('.html') or request.args.get('raw'):
+        return send_file(path, as_attachment=not name.endswith('.html'))
+
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        sort = 'cumulative'
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).strip_dirs().sort_stats(sort).print_stats(60)
+    return render_template('admin/profile_detail.html',
+                         profile=parse_profile_name(name),
+                         stats=output.getvalue(),
+                         current_sort=sort)
@@ -0,0 +1,295 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+import click
+from flask import request, session, g, render_template, jsonify
+from flask.cli import AppGroup
+from app import app
+
+try:
+    import redis
+except ImportError:  # The redis backend needs the redis package
+    redis = None
+
+# capacity: largest burst allowed; rate: tokens refilled per second
+Rule = namedtuple('Rule', ['capacity', 'rate'])
+
+# Result of taking a token; retry_after is in seconds
+Decision = namedtuple('Decision', ['allowed', 'remaining', 'retry_after'])
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Endpoints called with fetch() that parse the response as JSON
+JSON_ENDPOINTS = {'rate_note'}
+
+def parse_rule(value):
+    """Parse '30/minute' (a burst of 30, refilled over a minute) into a Rule"""
+    count, period = value.split('/', 1)
+    count = int(count)
+    return Rule(count, count / PERIODS[period.strip().rstrip('s')])
+
+def parse_rules(value):
+    """Parse 'login=10/minute;download_note=60/minute' into {name: Rule}"""
+    rules = {}
+    for item in value.split(';'):
+        if item.strip():
+            name, rule = item.split('=', 1)
+            rules[name.strip()] = parse_rule(rule)
+    return rules
+
+def refill(tokens, updated, now, rule):
+    """Bucket level at time now, given its level at time updated"""
+    return min(rule.capacity, tokens + max(0.0, now - updated) * rule.rate)
+
+def take_token(tokens, rule):
+    """(new level, Decision) for one request against a bucket at this level"""
+    if tokens >= 1:
+        return tokens - 1, Decision(True, int(tokens - 1), 0)
+    return tokens, Decision(False, 0, (1 - tokens) / rule.rate)
+
+def idle_seconds(rule):
+    """How long an untouched bucket takes to fill up, after which it can be dropped"""
+    return rule.capacity / rule.rate
+
+class MemoryBackend:
+    """Buckets in a dict; only shared between threads of one process"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.last_prune = time.time()
+
+    def take(self, key, rule, now):
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (rule.capacity, now, None))
+            tokens, decision = take_token(refill(tokens, updated, now, rule), rule)
+            self.buckets[key] = (tokens, now, now + idle_seconds(rule))
+            if now - self.last_prune > 60:
+                self.buckets = {k: v for k, v in self.buckets.items() if v[2] > now}
+                self.last_prune = now
+            return decision
+
+    def reset(self):
+        with self.lock:
+            self.buckets.clear()
+
+class SQLiteBackend:
+    """Buckets in a SQLite file, shared by every worker process on the host.
+
+    The file is separate from the app database so limiter writes never
+    compete for its write lock. Put it on a tmpfs (e.g. /dev/shm) to keep
+    it off disk entirely.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection().execute(
+            'CREATE TABLE IF NOT EXISTS bucket ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL)')
+        self.last_prune = 0
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Losing a few bucket updates in a power cut is harmless
+            connection.execute('PRAGMA synchronous=OFF')
+            self.local.connection = connection
+        return self.local.connection
+
+    def take(self, key, rule, now):
+        connection = self.connection()
+        # IMMEDIATE takes the write lock up front, so the read-modify-write
+        # below cannot interleave with another worker's
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (rule.capacity, now)
+            tokens, decision = take_token(refill(tokens, updated, now, rule), rule)
+            connection.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated, expires) VALUES (?, ?, ?, ?)',
+                               (key, tokens, now, now + idle_seconds(rule)))
+            if now - self.last_prune > 60:
+                connection.execute('DELETE FROM bucket WHERE expires < ?', (now,))
+                self.last_prune = now
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return decision
+
+    def reset(self):
+        self.connection().execute('DELETE FROM bucket')
+
+class RedisBackend:
+    """Buckets in Redis (or any server speaking its protocol), shared across hosts"""
+
+    # Same algorithm as take_token, run atomically on the server
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        if redis is None:
+            raise RuntimeError('The redis rate limit backend requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, rule, now):
+        allowed, tokens = self.script(keys=[self.prefix + key], args=[rule.capacity, rule.rate, now])
+        tokens = float(tokens)
+        if allowed:
+            return Decision(True, int(tokens), 0)
+        return Decision(False, 0, (1 - tokens) / rule.rate)
+
+    def reset(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+def create_backend():
+    backend = app.config['RATELIMIT_BACKEND']
+    if backend == 'memory':
+        return MemoryBackend()
+    if backend == 'sqlite':
+        return SQLiteBackend(app.config['RATELIMIT_SQLITE_PATH'] or os.path.join(app.instance_path, 'ratelimit.db'))
+    if backend == 'redis':
+        return RedisBackend(app.config['RATELIMIT_REDIS_URL'])
+    raise ValueError(f'Unknown RATELIMIT_BACKEND {backend!r}')
+
+def get_backend():
+    if 'ratelimit_backend' not in app.extensions:
+        app.extensions['ratelimit_backend'] = create_backend()
+    return app.extensions['ratelimit_backend']
+
+def get_rules():
+    if 'ratelimit_rules' not in app.extensions:
+        app.extensions['ratelimit_rules'] = parse_rules(app.config['RATELIMIT_RULES'])
+    return app.extensions['ratelimit_rules']
+
+def rule_name():
+    """Name of the rule that applies to the current request, if any"""
+    endpoint = request.endpoint
+    if endpoint == 'view_notes':
+        # Only searches are expensive; plain browsing is not limited
+        return 'search' if request.args.get('search') else None
+    if endpoint in ('login', 'admin_login') and request.method != 'POST':
+        return None
+    return endpoint
+
+def client_keys(name):
+    """Bucket keys: per IP address, plus per user when logged in.
+
+    A request needs a token from every bucket, so logging into several
+    accounts does not get around the per-IP limit.
+    """
+    keys = [f"{name}:ip:{request.remote_addr}"]
+    if 'user_id' in session:
+        keys.insert(0, f"{name}:user:{session['user_id']}")
+    return keys
+
+def combine(decisions):
+    """One Decision for a request that needs a token from every bucket"""
+    return Decision(all(d.allowed for d in decisions),
+                    min(d.remaining for d in decisions),
+                    max(d.retry_after for d in decisions))
+
+@app.before_request
+def check_rate_limit():
+    if not app.config['RATELIMIT_ENABLED']:
+        return None
+    name = rule_name()
+    rule = get_rules().get(name)
+    if rule is None:
+        return None
+
+    started = time.perf_counter()
+    try:
+        now = time.time()
+        decision = combine([get_backend().take(key, rule, now) for key in client_keys(name)])
+    except Exception as e:
+        # Fail open: a broken limiter must not take the site down with it
+        app.logger.error(f"Rate limiter unavailable: {e}")
+        return None
+    finally:
+        g.ratelimit_duration = time.perf_counter() - started
+
+    g.ratelimit = (rule, decision)
+    if decision.allowed:
+        return None
+    app.logger.warning(f"Rate limited {' '.join(client_keys(name))} on {request.path}")
+    return rate_limited_response(math.ceil(decision.retry_after))
+
+def rate_limited_response(retry_after):
+    if request.endpoint in JSON_ENDPOINTS or request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'success': False,
+            'message': f"Too many requests. Please try again in {retry_after} "
+                       f"second{'s' if retry_after != 1 else ''}."
+        }), 429
+    return render_template('429.html', retry_after=retry_after), 429
+
+@app.after_request
+def add_rate_limit_headers(response):
+    if 'ratelimit_duration' in g:
+        response.headers.add('Server-Timing', f"ratelimit;dur={g.ratelimit_duration * 1000:.3f}")
+    if 'ratelimit' in g:
+        rule, decision = g.ratelimit
+        response.headers['X-RateLimit-Limit'] = str(rule.capacity)
+        response.headers['X-RateLimit-Remaining'] = str(decision.remaining)
+        if not decision.allowed:
+            response.headers['Retry-After'] = str(math.ceil(decision.retry_after))
+    return response
+
+ratelimit_cli = AppGroup('ratelimit', help='Rate limiting commands.')
+
+@ratelimit_cli.command('rules')
+def rules_command():
+    """Show the configured rate limits."""
+    click.echo(f"Backend: {app.config['RATELIMIT_BACKEND']}"
+               f"{'' if app.config['RATELIMIT_ENABLED'] else ' (disabled)'}")
+    for name, rule in sorted(get_rules().items()):
+        click.echo(f"  {name:<16} burst {rule.capacity:>4}, {rule.rate * 60:.1f}/minute")
+
+@ratelimit_cli.command('reset')
+def reset_command():
+    """Clear every bucket, e.g. after changing limits."""
+    get_backend().reset()
+    click.echo('Rate limit buckets cleared')
+
+@ratelimit_cli.command('benchmark')
+@click.option('--requests', 'count', default=20000, help='Tokens to take.')
+@click.option('--keys', default=1000, help='Distinct clients.')
+def benchmark_command(count, keys):
+    """Measure the per-request cost of the configured backend."""
+    backend = get_backend()
+    # Benchmark buckets refill within a second and are pruned like any other
+    rule = Rule(100, 100.0)
+    timings = []
+    for i in range(count):
+        started = time.perf_counter()
+        backend.take(f"benchmark:ip:{i % keys}", rule, time.time())
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    click.echo(f"{app.config['RATELIMIT_BACKEND']}: {count / sum(timings):.0f} ops/s, "
+               f"p50 {timings[len(timings) // 2] * 1e6:.0f}us, p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f}us")
+
+app.cli.add_command(ratelimit_cli)
@@ -0,0 +1,45 @@
+import click
+from flask.cli import AppGroup
+from app import app
+from models import Note, NoteRecommendation
+
+# Serving side of the "related notes" recommender. The recommendations are
+# computed offline by recommender.py, which needs NumPy and SciPy; it is
+# imported inside the commands below so web workers never load either.
+
+def get_related_notes(note_id, limit=None):
+    """Return approved related notes for a note, best match first"""
+    query = Note.query.join(NoteRecommendation, NoteRecommendation.related_note_id == Note.id) \
+        .filter(NoteRecommendation.note_id == note_id, Note.is_approved == True) \
+        .order_by(NoteRecommendation.rank)
+    return query.limit(limit or app.config['RECOMMENDATIONS_TOP_K']).all()
+
+recommendations_cli = AppGroup('recommendations', help='"Related notes" recommender commands.')
+
+def echo_timings(timings):
+    for phase, seconds in timings.items():
+        click.echo(f"  {phase:<12}{seconds:8.2f}s")
+
+@recommendations_cli.command('rebuild')
+@click.option('--incremental', is_flag=True, help='Only recompute notes affected since the last build.')
+def rebuild_command(incremental):
+    """Rebuild precomputed related notes from the Download table."""
+    from recommender import rebuild_recommendations
+    stats = rebuild_recommendations(incremental=incremental)
+    click.echo(f"Computed {stats['notes']} notes, stored {stats['rows']} recommendations")
+    echo_timings(stats['timings'])
+
+@recommendations_cli.command('benchmark')
+@click.option('--downloads', default=10000000, help='Number of synthetic downloads.')
+@click.option('--users', default=500000, help='Number of synthetic users.')
+@click.option('--notes', default=20000, help='Number of synthetic notes.')
+@click.option('--seed', default=42, help='Random seed.')
+def benchmark_command(downloads, users, notes, seed):
+    """Time the recommender on a synthetic dataset without touching the database."""
+    from recommender import benchmark_similarity
+    stats = benchmark_similarity(downloads, users, notes, seed)
+    click.echo(f"{downloads} downloads, {users} users, {stats['notes']} notes, "
+               f"{stats['pairs']} distinct pairs, {stats['rows']} recommendations")
+    echo_timings(stats['timings'])
+
+app.cli.add_command(recommendations_cli)
@@ -0,0 +1,192 @@
+import time
+from datetime import datetime
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy import select, insert, delete, func
+from app import app, db
+from models import Note, Download, NoteRecommendation
+
+# The offline side of the "related notes" recommender. Only the CLI in
+# recommendations.py imports this module, so web workers never load
+# NumPy or SciPy.
+
+# Number of note rows multiplied at once; bounds the memory of X^T X
+BLOCK_SIZE = 2000
+
+def build_download_matrix(user_ids, note_ids):
+    """Build a binary user x note matrix from download pairs.
+
+    Returns the matrix in CSC form plus the note id for every column.
+    """
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    notes, note_index = np.unique(note_ids, return_inverse=True)
+    data = np.ones(len(user_index), dtype=np.float32)
+    matrix = sp.csc_matrix((data, (user_index, note_index)), shape=(len(users), len(notes)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1  # Repeat downloads by the same user count once
+    return matrix, notes
+
+def top_k_similar(matrix, subjects, semesters, eligible, top_k,
+                  subject_weight=0.0, semester_weight=0.0, rows=None):
+    """Yield (row, [(column, score), ...]) with the top_k most similar notes.
+
+    Similarity is the cosine of the co-download counts, boosted when two
+    notes share a subject or a semester. Columns that are not eligible
+    (e.g. unapproved notes) are never recommended.
+    """
+    rows = np.arange(matrix.shape[1]) if rows is None else np.asarray(rows)
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    matrix_csr = matrix.tocsr()
+
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block_rows = rows[start:start + BLOCK_SIZE]
+        block = (matrix[:, block_rows].T @ matrix_csr).tocsr()
+
+        # Score every non-zero co-occurrence in the block at once
+        row_of = block_rows[np.repeat(np.arange(len(block_rows)), np.diff(block.indptr))]
+        cols = block.indices
+        scores = block.data / (norms[row_of] * norms[cols])
+        scores *= 1 + subject_weight * (subjects[row_of] == subjects[cols])
+        scores *= 1 + semester_weight * (semesters[row_of] == semesters[cols])
+        scores[(row_of == cols) | ~eligible[cols]] = 0
+
+        for i, row in enumerate(block_rows):
+            lo, hi = block.indptr[i], block.indptr[i + 1]
+            row_scores = scores[lo:hi]
+            if hi - lo > top_k:
+                best = np.argpartition(row_scores, -top_k)[-top_k:]
+            else:
+                best = np.arange(hi - lo)
+            best = best[np.argsort(-row_scores[best], kind='stable')]
+            yield row, [(cols[lo + j], float(row_scores[j])) for j in best if row_scores[j] > 0]
+
+def load_download_pairs(chunk_size=100000):
+    """Stream (user_id, note_id) download pairs into numpy arrays"""
+    query = select(Download.user_id, Download.note_id)
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+
+    chunks = [np.array(partition, dtype=np.int64) for partition in result.partitions()]
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.concatenate(chunks)
+    return pairs[:, 0], pairs[:, 1]
+
+def load_note_metadata(note_ids):
+    """Return subject, semester and approval arrays aligned with note_ids"""
+    rows = db.session.execute(
+        select(Note.id, Note.subject_id, Note.semester, func.coalesce(Note.is_approved, False))
+        .order_by(Note.id)
+    ).all()
+    meta = np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+    subjects = np.full(len(note_ids), -1, dtype=np.int64)
+    semesters = np.full(len(note_ids), -1, dtype=np.int64)
+    eligible = np.zeros(len(note_ids), dtype=bool)
+    if len(meta):
+        position = np.minimum(np.searchsorted(meta[:, 0], note_ids), len(meta) - 1)
+        found = meta[position, 0] == note_ids
+        subjects[found] = meta[position[found], 1]
+        semesters[found] = meta[position[found], 2]
+        eligible[found] = meta[position[found], 3] == 1
+    return subjects, semesters, eligible
+
+def affected_note_ids(since):
+    """Notes whose co-download counts changed since the given time.
+
+    That is every note downloaded since then, plus every note previously
+    downloaded by a user who has downloaded something since.
+    """
+    recent = select(Download.user_id).where(Download.download_date > since)
+    rows = db.session.execute(
+        select(Download.note_id).where(Download.user_id.in_(recent)).distinct()
+    ).scalars().all()
+    return set(rows)
+
+def rebuild_recommendations(incremental=False):
+    """Recompute NoteRecommendation rows and return timing statistics.
+
+    With incremental=True only notes affected by downloads since the last
+    build are recomputed; scores of their neighbours are refreshed on the
+    next full rebuild.
+    """
+    timings = {}
+    started = time.perf_counter()
+    build_time = datetime.utcnow()
+
+    only_notes = None
+    if incremental:
+        last_build = db.session.query(func.max(NoteRecommendation.created_at)).scalar()
+        if last_build is not None:
+            only_notes = affected_note_ids(last_build)
+            if not only_notes:
+                return {'notes': 0, 'rows': 0, 'timings': timings}
+
+    user_ids, note_ids = load_download_pairs()
+    timings['load'] = time.perf_counter() - started
+
+    step = time.perf_counter()
+    matrix, column_note_ids = build_download_matrix(user_ids, note_ids)
+    subjects, semesters, eligible = load_note_metadata(column_note_ids)
+    timings['matrix'] = time.perf_counter() - step
+
+    rows = None
+    if only_notes is not None:
+        rows = np.flatnonzero(np.isin(column_note_ids, list(only_notes)))
+
+    step = time.perf_counter()
+    records = []
+    computed = 0
+    for row, similar in top_k_similar(matrix, subjects, semesters, eligible,
+                                      app.config['RECOMMENDATIONS_TOP_K'],
+                                      app.config['RECOMMENDATIONS_SUBJECT_WEIGHT'],
+                                      app.config['RECOMMENDATIONS_SEMESTER_WEIGHT'],
+                                      rows=rows):
+        computed += 1
+        note_id = int(column_note_ids[row])
+        for rank, (col, score) in enumerate(similar, start=1):
+            records.append({'note_id': note_id, 'related_note_id': int(column_note_ids[col]),
+                            'rank': rank, 'score': score, 'created_at': build_time})
+    timings['similarity'] = time.perf_counter() - step
+
+    # Replace stored rows in one transaction
+    step = time.perf_counter()
+    stale = delete(NoteRecommendation)
+    if only_notes is not None:
+        stale = stale.where(NoteRecommendation.note_id.in_(only_notes))
+    db.session.execute(stale)
+    for start in range(0, len(records), 10000):
+        db.session.execute(insert(NoteRecommendation), records[start:start + 10000])
+    db.session.commit()
+    timings['store'] = time.perf_counter() - step
+    timings['total'] = time.perf_counter() - started
+
+    return {'notes': computed, 'rows': len(records), 'timings': timings}
+
+def benchmark_similarity(downloads, users, notes, seed):
+    """Time the recommender on a synthetic dataset; returns statistics"""
+    rng = np.random.default_rng(seed)
+    # Zipf-like popularity so a few notes dominate, as in real download logs
+    popularity = 1.0 / np.arange(1, notes + 1) ** 0.8
+    popularity /= popularity.sum()
+    user_ids = rng.integers(0, users, size=downloads)
+    note_ids = rng.choice(notes, size=downloads, p=popularity)
+    subjects = rng.integers(0, 10, size=notes)
+    semesters = rng.integers(1, 9, size=notes)
+    eligible = np.ones(notes, dtype=bool)
+
+    timings = {}
+    step = time.perf_counter()
+    matrix, column_note_ids = build_download_matrix(user_ids, note_ids)
+    timings['matrix'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    stored = 0
+    for _, similar in top_k_similar(matrix, subjects[column_note_ids], semesters[column_note_ids],
+                                    eligible[column_note_ids], app.config['RECOMMENDATIONS_TOP_K'],
+                                    app.config['RECOMMENDATIONS_SUBJECT_WEIGHT'],
+                                    app.config['RECOMMENDATIONS_SEMESTER_WEIGHT']):
+        stored += len(similar)
+    timings['similarity'] = time.perf_counter() - step
+    timings['total'] = timings['matrix'] + timings['similarity']
+
+    return {'notes': len(column_note_ids), 'pairs': matrix.nnz, 'rows': stored, 'timings': timings}
@@ -0,0 +1,205 @@
+import os
+import io
+import csv
+import gzip
+import json
+import time
+from collections import namedtuple, Counter
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, delete
+from app import app, db
+from models import Download
+
+try:
+    import zstandard
+except ImportError:  # Archives fall back to gzip
+    zstandard = None
+
+ARCHIVE_COLUMNS = ['id', 'user_id', 'note_id', 'download_date']
+
+DailyCount = namedtuple('DailyCount', ['date', 'count'])
+
+def partition_path(month):
+    """Directory holding the archive for one month, e.g. month=2025-03"""
+    return os.path.join(app.config['DOWNLOAD_ARCHIVE_FOLDER'], f'month={month}')
+
+def compress(data):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), '.csv.zst'
+    return gzip.compress(data, compresslevel=9), '.csv.gz'
+
+def decompress(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f'Reading {path} requires the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def write_partition(month, rows):
+    """Write one compressed CSV part file and update the month's daily summary"""
+    folder = partition_path(month)
+    os.makedirs(folder, exist_ok=True)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ARCHIVE_COLUMNS)
+    for row in rows:
+        writer.writerow([row.id, row.user_id, row.note_id, row.download_date.isoformat()])
+    data, extension = compress(buffer.getvalue().encode('utf-8'))
+    part_name = f'part-{rows[0].id}-{rows[-1].id}{extension}'
+    stale = [name for name in stale_parts(month, rows) if name != part_name]
+    write_atomic(os.path.join(folder, part_name), data)
+
+    summary = read_summary(month)
+    for name in stale:
+        summary.pop(name, None)
+    summary[part_name] = dict(Counter(row.download_date.date().isoformat() for row in rows))
+    write_atomic(os.path.join(folder, 'summary.json'), json.dumps({'parts': summary}).encode('utf-8'))
+
+    for name in stale:
+        os.remove(os.path.join(folder, name))
+        app.logger.warning(f"Removed {name} from month={month}, left by an interrupted archive run")
+
+def part_files(folder):
+    return sorted(name for name in os.listdir(folder) if name.startswith('part-') and '.csv' in name
+                  and not name.endswith('.tmp'))
+
+def part_id_range(name):
+    """(first id, last id) from a part file name like part-101-200.csv.zst"""
+    first, last = name[len('part-'):].split('.', 1)[0].split('-')
+    return int(first), int(last)
+
+def stale_parts(month, rows):
+    """Parts left by a run that crashed before deleting these rows.
+
+    Rows are only deleted from the table after their part is written, so
+    an existing part holding any of these ids was never committed. Its
+    other rows are still in the table and get archived again, possibly in
+    batches of a different size, so the whole part must go. Parts whose
+    id range merely overlaps are kept: ids need not follow download dates.
+    """
+    first, last = rows[0].id, rows[-1].id
+    ids = {row.id for row in rows}
+    folder = partition_path(month)
+    stale = []
+    for name in part_files(folder):
+        part_first, part_last = part_id_range(name)
+        if part_last < first or part_first > last:
+            continue
+        reader = csv.DictReader(io.StringIO(decompress(os.path.join(folder, name)).decode('utf-8')))
+        if not ids.isdisjoint(int(row['id']) for row in reader):
+            stale.append(name)
+    return stale
+
+def read_summary(month):
+    """Per-part daily download counts for an archived month"""
+    summary_path = os.path.join(partition_path(month), 'summary.json')
+    if not os.path.exists(summary_path):
+        return {}
+    with open(summary_path) as f:
+        return json.load(f)['parts']
+
+def archive_downloads(cutoff, batch_size):
+    """Move Download rows older than cutoff into monthly archive files.
+
+    Rows are written and then deleted in batches of batch_size, each in its
+    own transaction, so the table is never locked for long.
+    Returns (archived rows, elapsed seconds).
+    """
+    archived = 0
+    started = time.perf_counter()
+    while True:
+        rows = db.session.execute(
+            select(Download.id, Download.user_id, Download.note_id, Download.download_date)
+            .where(Download.download_date < cutoff)
+            .order_by(Download.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row.download_date.strftime('%Y-%m'), []).append(row)
+        for month, month_rows in by_month.items():
+            write_partition(month, month_rows)
+
+        db.session.execute(delete(Download).where(Download.id.in_([row.id for row in rows])))
+        db.session.commit()
+        archived += len(rows)
+        app.logger.info(f"Archived {archived} downloads")
+    return archived, time.perf_counter() - started
+
+def archived_months(start=None, end=None):
+    """Months (YYYY-MM) with archived downloads, optionally limited to a date range"""
+    root = app.config['DOWNLOAD_ARCHIVE_FOLDER']
+    if not os.path.isdir(root):
+        return []
+    months = sorted(name.split('=', 1)[1] for name in os.listdir(root) if name.startswith('month='))
+    if start:
+        months = [m for m in months if m >= start.strftime('%Y-%m')]
+    if end:
+        months = [m for m in months if m <= end.strftime('%Y-%m')]
+    return months
+
+def read_archived_downloads(start=None, end=None):
+    """Yield archived downloads as dicts, optionally within [start, end)"""
+    for month in archived_months(start, end):
+        folder = partition_path(month)
+        for name in part_files(folder):
+            reader = csv.DictReader(io.StringIO(decompress(os.path.join(folder, name)).decode('utf-8')))
+            for row in reader:
+                download_date = datetime.fromisoformat(row['download_date'])
+                if (start and download_date < start) or (end and download_date >= end):
+                    continue
+                yield {'id': int(row['id']), 'user_id': int(row['user_id']),
+                       'note_id': int(row['note_id']), 'download_date': download_date}
+
+def archived_downloads_by_date():
+    """Daily archived download counts, read from the per-month summaries"""
+    counts = Counter()
+    for month in archived_months():
+        for daily in read_summary(month).values():
+            counts.update(daily)
+    return counts
+
+def downloads_by_date(live_rows):
+    """Merge live (date, count) rows with archived daily counts"""
+    counts = archived_downloads_by_date()
+    for row in live_rows:
+        counts[str(row.date)] += row.count
+    return [DailyCount(date, count) for date, count in sorted(counts.items())]
+
+retention_cli = AppGroup('retention', help='Download log retention commands.')
+
+@retention_cli.command('archive')
+@click.option('--days', default=None, type=int, help='Keep this many days live (default: DOWNLOAD_RETENTION_DAYS).')
+@click.option('--batch-size', default=None, type=int, help='Rows per batch (default: RETENTION_BATCH_SIZE).')
+def archive_command(days, batch_size):
+    """Archive and delete Download rows older than the retention window."""
+    days = days if days is not None else app.config['DOWNLOAD_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    archived, elapsed = archive_downloads(cutoff, batch_size or app.config['RETENTION_BATCH_SIZE'])
+    click.echo(f"Archived {archived} downloads older than {cutoff:%Y-%m-%d} in {elapsed:.1f}s")
+
+@retention_cli.command('stats')
+def stats_command():
+    """Show archived download counts per month."""
+    for month in archived_months():
+        parts = read_summary(month)
+        total = sum(sum(daily.values()) for daily in parts.values())
+        click.echo(f"{month}  {len(parts):>5} parts  {total:>10} downloads")
+
+app.cli.add_command(retention_cli)
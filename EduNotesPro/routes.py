@@ -1,13 +1,21 @@
 import os
 import uuid
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, session, send_file, jsonify, abort
+from flask import render_template, request, redirect, url_for, flash, session, send_file, jsonify, abort, Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from sqlalchemy import or_, desc, func
 from app import app, db, mail
 from models import User, Note, Subject, Rating, Comment, Download
-from utils import send_email, allowed_file, get_file_size
+from utils import send_email, allowed_file
+from storage import get_storage
+from extraction import extract_in_background
+from retention import downloads_by_date as merge_archived_downloads
+from recommendations import get_related_notes
+from trending import trending_notes, record_download, record_rating
+from bundles import bundle_files, bundle_etag, stream_zip, cache_path_for, prune_cache
+from exports import filter_notes, filter_users, filter_ratings
+from search_index import content_match
 from flask_mail import Message
 
 # Initialize default subjects - moved to app.py to avoid decorator issue
@@ -17,8 +25,8 @@ def index():
     # Get latest notes
     latest_notes = Note.query.filter_by(is_approved=True).order_by(desc(Note.upload_date)).limit(6).all()
     
-    # Get most downloaded notes
-    popular_notes = Note.query.filter_by(is_approved=True).order_by(desc(Note.download_count)).limit(6).all()
+    # Get trending notes (time-decayed downloads and ratings)
+    popular_notes = trending_notes(6)
     
     # Get statistics
     total_notes = Note.query.filter_by(is_approved=True).count()
@@ -179,15 +187,15 @@ def upload_note():
         if file and file.filename and allowed_file(file.filename):
             # Generate unique filename
             filename = str(uuid.uuid4()) + '.' + file.filename.rsplit('.', 1)[1].lower()
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            storage = get_storage()
+            storage.save(file, filename)
             
             note = Note()
             note.title = title
             note.description = description
             note.filename = filename
             note.original_filename = file.filename
-            note.file_size = get_file_size(file_path)
+            note.file_size = storage.size(filename)
             note.semester = int(semester)
             note.user_id = session['user_id']
             note.subject_id = int(subject_id)
@@ -195,6 +203,12 @@ def upload_note():
             db.session.add(note)
             db.session.commit()
             
+            # Extract searchable text in the background
+            try:
+                extract_in_background(note)
+            except Exception as e:
+                app.logger.error(f"Failed to queue text extraction: {e}")
+            
             flash('Note uploaded successfully! It will be visible after admin approval.', 'success')
             return redirect(url_for('dashboard'))
         else:
@@ -219,14 +233,17 @@ def view_notes():
     if semester:
         query = query.filter_by(semester=semester)
     if search:
-        query = query.filter(or_(
-            Note.title.contains(search),
-            Note.description.contains(search)
-        ))
+        conditions = [Note.title.contains(search), Note.description.contains(search)]
+        content_condition = content_match(search)
+        if content_condition is not None:
+            conditions.append(content_condition)
+        query = query.filter(or_(*conditions))
     
     # Apply sorting
     if sort_by == 'newest':
         query = query.order_by(desc(Note.upload_date))
+    elif sort_by == 'trending':
+        query = query.order_by(Note.trending_score.desc().nulls_last(), desc(Note.download_count))
     elif sort_by == 'downloads':
         query = query.order_by(desc(Note.download_count))
     elif sort_by == 'rating':
@@ -258,10 +275,14 @@ def note_detail(note_id):
     if 'user_id' in session:
         user_rating = Rating.query.filter_by(user_id=session['user_id'], note_id=note_id).first()
     
+    # Precomputed by the recommender, see recommendations.py
+    related_notes = get_related_notes(note_id)
+    
     return render_template('note_detail.html', 
                          note=note, 
                          comments=comments, 
-                         user_rating=user_rating)
+                         user_rating=user_rating,
+                         related_notes=related_notes)
 
 @app.route('/download/<int:note_id>')
 def download_note(note_id):
@@ -274,9 +295,9 @@ def download_note(note_id):
     if not note.is_approved:
         abort(404)
     
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], note.filename)
+    storage = get_storage()
     
-    if not os.path.exists(file_path):
+    if not storage.exists(note.filename):
         flash('File not found!', 'error')
         return redirect(url_for('view_notes'))
     
@@ -288,9 +309,65 @@ def download_note(note_id):
     
     # Increment download count
     note.download_count += 1
+    record_download(note)
     db.session.commit()
     
-    return send_file(file_path, as_attachment=True, download_name=note.original_filename)
+    return storage.send(note.filename, note.original_filename)
+
+@app.route('/download/bundle')
+def download_bundle():
+    if 'user_id' not in session:
+        flash('Please log in to download notes.', 'error')
+        return redirect(url_for('login'))
+    
+    subject_id = request.args.get('subject_id', type=int)
+    semester = request.args.get('semester', type=int)
+    if not subject_id or not semester:
+        abort(404)
+    
+    subject = Subject.query.get_or_404(subject_id)
+    notes = Note.query.filter_by(is_approved=True, subject_id=subject_id, semester=semester).order_by(Note.id).all()
+    
+    if not notes:
+        flash('No notes available for this subject and semester.', 'error')
+        return redirect(url_for('view_notes', subject=subject_id, semester=semester))
+    
+    files = bundle_files(notes)
+    etag = bundle_etag(files)
+    download_name = f"{subject.code}-semester-{semester}.zip"
+    
+    # The browser already has this exact bundle
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    # Record all downloads in one batch
+    now = datetime.utcnow()
+    for note in notes:
+        download = Download()
+        download.user_id = session['user_id']
+        download.note_id = note.id
+        download.download_date = now
+        db.session.add(download)
+        note.download_count += 1
+        record_download(note, now)
+    db.session.commit()
+    
+    # Serve a previously generated copy, or stream and cache a new one
+    cache_path = cache_path_for(subject_id, semester, etag)
+    if os.path.exists(cache_path):
+        response = send_file(cache_path, mimetype='application/zip', as_attachment=True,
+                             download_name=download_name, etag=etag, conditional=False)
+    else:
+        prune_cache(subject_id, semester, keep=cache_path)
+        response = Response(stream_with_context(stream_zip(files, cache_path)), mimetype='application/zip')
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        response.set_etag(etag)
+    
+    response.cache_control.private = True
+    response.cache_control.max_age = app.config['BUNDLE_CACHE_MAX_AGE']
+    return response
 
 @app.route('/rate_note', methods=['POST'])
 def rate_note():
@@ -322,6 +399,11 @@ def rate_note():
         rating.note_id = note_id
         rating.score = score
         db.session.add(rating)
+        
+        # Only first-time ratings count towards trending
+        rated_note = Note.query.get(note_id)
+        if rated_note:
+            record_rating(rated_note, score)
     
     db.session.commit()
     
@@ -421,23 +503,7 @@ def admin_notes():
     subject_filter = request.args.get('subject', '')
     search_query = request.args.get('search', '')
     
-    # Base query
-    query = Note.query
-    
-    # Apply filters
-    if status_filter == 'approved':
-        query = query.filter_by(is_approved=True)
-    elif status_filter == 'pending':
-        query = query.filter_by(is_approved=False)
-    
-    if subject_filter:
-        query = query.filter_by(subject_id=subject_filter)
-    
-    if search_query:
-        query = query.filter(or_(
-            Note.title.contains(search_query),
-            Note.description.contains(search_query)
-        ))
+    query = filter_notes(status_filter, subject_filter, search_query)
     
     notes = query.order_by(desc(Note.upload_date)).all()
     subjects = Subject.query.all()
@@ -458,22 +524,7 @@ def admin_users():
     status_filter = request.args.get('status', '')
     search_query = request.args.get('search', '')
     
-    # Base query
-    query = User.query
-    
-    # Apply filters
-    if status_filter == 'blocked':
-        query = query.filter_by(is_blocked=True)
-    elif status_filter == 'active':
-        query = query.filter_by(is_blocked=False)
-    elif status_filter == 'admin':
-        query = query.filter_by(is_admin=True)
-    
-    if search_query:
-        query = query.filter(or_(
-            User.username.contains(search_query),
-            User.email.contains(search_query)
-        ))
+    query = filter_users(status_filter, search_query)
     
     users = query.order_by(desc(User.created_at)).all()
     
@@ -488,7 +539,7 @@ def admin_feedback():
         abort(403)
     
     # Get all ratings with comments
-    ratings = Rating.query.filter(Rating.comment.isnot(None)).order_by(desc(Rating.date)).all()
+    ratings = filter_ratings(comments_only=True).order_by(desc(Rating.date)).all()
     
     return render_template('admin/feedback.html', ratings=ratings)
 
@@ -497,11 +548,12 @@ def admin_analytics():
     if 'user_id' not in session or not session.get('is_admin'):
         abort(403)
     
-    # Download analytics
-    downloads_by_date = db.session.query(
+    # Download analytics (live rows plus archived history)
+    live_downloads_by_date = db.session.query(
         func.date(Download.download_date).label('date'),
         func.count(Download.id).label('count')
     ).group_by(func.date(Download.download_date)).order_by('date').all()
+    downloads_by_date = merge_archived_downloads(live_downloads_by_date)
     
     # Top downloaded notes
     top_notes = Note.query.filter_by(is_approved=True).order_by(desc(Note.download_count)).limit(10).all()
@@ -516,6 +568,7 @@ def admin_analytics():
     ).join(Note).filter(Note.is_approved == True).group_by(Subject.name).all()
     
     return render_template('admin/analytics.html',
+                         now=datetime.utcnow(),
                          downloads_by_date=downloads_by_date,
                          top_notes=top_notes,
                          zero_downloads=zero_downloads,
@@ -630,10 +683,8 @@ def delete_note(note_id):
     
     note = Note.query.get_or_404(note_id)
     
-    # Delete file from filesystem
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], note.filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    # Delete file from storage
+    get_storage().delete(note.filename)
     
     # Delete note from database (cascading will handle related records)
     title = note.title
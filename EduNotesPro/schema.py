@@ -0,0 +1,99 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from app import app, db
+from search_index import index_exists, create_index
+
+# db.create_all() only creates missing tables, so columns and indexes
+# added to existing tables are applied by "flask db upgrade". It is run
+# once per deploy rather than at import, where several workers starting
+# together would race to ALTER the same table.
+
+def missing_columns():
+    """(table, column) pairs declared on the models but absent from the database"""
+    inspector = inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        missing.extend((table, column) for column in table.columns if column.name not in existing)
+    return missing
+
+def column_exists(table, column):
+    return column.name in {c['name'] for c in inspect(db.engine).get_columns(table.name)}
+
+def add_column(table, column):
+    """ALTER TABLE ADD COLUMN; returns False if it cannot be added safely"""
+    column_type = column.type.compile(db.engine.dialect)
+    definition = f'"{column.name}" {column_type}'
+    if not column.nullable:
+        default = column.server_default
+        if default is None:
+            return False
+        arg = default.arg
+        arg = f"'{arg}'" if isinstance(arg, str) else arg.compile(dialect=db.engine.dialect)
+        definition += f' NOT NULL DEFAULT {arg}'
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {definition}'))
+    except DBAPIError:
+        # Another process may have added it meanwhile
+        if not column_exists(table, column):
+            raise
+    return True
+
+def upgrade():
+    """Create missing tables, columns and indexes; returns a list of changes"""
+    changes = []
+    db.create_all()
+    for table, column in missing_columns():
+        if add_column(table, column):
+            changes.append(f"added column {table.name}.{column.name}")
+        else:
+            app.logger.error(f"Cannot add NOT NULL column {table.name}.{column.name} without a server "
+                             f"default; migrate it by hand")
+
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(db.engine, checkfirst=True)
+                changes.append(f"created index {index.name}")
+            except DBAPIError:
+                if index.name not in {i['name'] for i in inspect(db.engine).get_indexes(table.name)}:
+                    raise
+
+    if create_index():
+        changes.append("created full-text search index")
+    return changes
+
+def check_schema():
+    """Log loudly at startup when the database needs "flask db upgrade"."""
+    missing = missing_columns()
+    if missing:
+        names = ', '.join(f"{table.name}.{column.name}" for table, column in missing)
+        app.logger.error(f"Database schema is out of date (missing {names}); "
+                         f"run 'flask --app main db upgrade'")
+    if not index_exists():
+        app.logger.error("Full-text search index is missing, so searches only match titles and "
+                         "descriptions; run 'flask --app main db upgrade'")
+
+db_cli = AppGroup('db', help='Database schema commands.')
+
+@db_cli.command('upgrade')
+def upgrade_command():
+    """Add tables, columns and indexes introduced since the database was created."""
+    changes = upgrade()
+    for change in changes:
+        click.echo(f"  {change}")
+    click.echo(f"Schema up to date ({len(changes)} changes applied)")
+
+app.cli.add_command(db_cli)
+
+with app.app_context():
+    check_schema()
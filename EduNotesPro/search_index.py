@@ -0,0 +1,79 @@
+import re
+from sqlalchemy import text, column, select, func, inspect, Integer
+from app import app, db
+from models import Note, NoteText
+
+# Full-text index over NoteText.content, so searches match indexed terms
+# instead of scanning every note's extracted text with LIKE.
+#
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+# PostgreSQL: a GIN expression index on to_tsvector(content).
+
+TERM_PATTERN = re.compile(r'\w+')
+
+SQLITE_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5("
+    "content, content='note_text', content_rowid='note_id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS note_text_fts_insert AFTER INSERT ON note_text BEGIN "
+    "INSERT INTO note_fts(rowid, content) VALUES (new.note_id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS note_text_fts_delete AFTER DELETE ON note_text BEGIN "
+    "INSERT INTO note_fts(note_fts, rowid, content) VALUES ('delete', old.note_id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS note_text_fts_update AFTER UPDATE ON note_text BEGIN "
+    "INSERT INTO note_fts(note_fts, rowid, content) VALUES ('delete', old.note_id, old.content); "
+    "INSERT INTO note_fts(rowid, content) VALUES (new.note_id, new.content); END",
+]
+
+POSTGRES_INDEX = 'ix_note_text_content_fts'
+
+def tsvector():
+    return func.to_tsvector('simple', func.coalesce(NoteText.content, ''))
+
+def dialect_name():
+    return db.engine.dialect.name
+
+def index_exists():
+    """Whether the full-text index has been created (by "flask db upgrade")"""
+    if app.extensions.get('search_index_ready'):
+        return True
+    inspector = inspect(db.engine)
+    if dialect_name() == 'sqlite':
+        ready = inspector.has_table('note_fts')
+    elif dialect_name() == 'postgresql':
+        ready = POSTGRES_INDEX in {index['name'] for index in inspector.get_indexes('note_text')}
+    else:
+        ready = False
+    if ready:
+        app.extensions['search_index_ready'] = True
+    return ready
+
+def create_index():
+    """Create and fill the full-text index; returns True if it was new"""
+    if index_exists():
+        return False
+    with db.engine.begin() as connection:
+        if dialect_name() == 'sqlite':
+            for statement in SQLITE_SETUP:
+                connection.execute(text(statement))
+            # Index the text extracted before the table existed
+            connection.execute(text("INSERT INTO note_fts(note_fts) VALUES ('rebuild')"))
+        elif dialect_name() == 'postgresql':
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON note_text "
+                f"USING GIN (to_tsvector('simple', coalesce(content, '')))"))
+        else:
+            return False
+    return True
+
+def content_match(search):
+    """Condition on Note.id matching notes whose extracted text contains
+    every word of search (as a prefix), or None if there is no index"""
+    terms = TERM_PATTERN.findall(search)
+    if not terms or not index_exists():
+        return None
+    if dialect_name() == 'sqlite':
+        matches = text("SELECT rowid FROM note_fts WHERE note_fts MATCH :fts_query") \
+            .bindparams(fts_query=' '.join(f'"{term}"*' for term in terms)) \
+            .columns(column('rowid', Integer))
+        return Note.id.in_(matches.subquery().select())
+    tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+    return Note.id.in_(select(NoteText.note_id).where(tsvector().op('@@')(tsquery)))
@@ -0,0 +1,185 @@
+import os
+import time
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+import click
+from flask import send_file, redirect
+from flask.cli import AppGroup
+from app import app
+from utils import get_file_size
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # Only needed for the S3 backend
+    boto3 = None
+
+def shard_path(name, depth=2):
+    """Spread files over nested directories, e.g. ab/cd/<name>"""
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    parts = [digest[i * 2:i * 2 + 2] for i in range(depth)]
+    return '/'.join(parts + [name])
+
+class LocalStorage:
+    """Uploads on the local filesystem in a hash-sharded layout.
+
+    Files still sitting in the old flat layout are read transparently until
+    they are moved with `flask storage migrate`.
+    """
+
+    def __init__(self, root, shard_depth=2):
+        # send_file resolves relative paths against the app root, not the cwd
+        self.root = os.path.abspath(root)
+        self.shard_depth = shard_depth
+
+    def path(self, name):
+        return os.path.join(self.root, *shard_path(name, self.shard_depth).split('/'))
+
+    def legacy_path(self, name):
+        return os.path.join(self.root, name)
+
+    def _existing_path(self, name):
+        for path in (self.path(name), self.legacy_path(name)):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def save(self, fileobj, name):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if hasattr(fileobj, 'save'):
+            fileobj.save(path)
+        else:
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(fileobj, f)
+
+    def open(self, name):
+        return open(self._existing_path(name) or self.path(name), 'rb')
+
+    def exists(self, name):
+        return self._existing_path(name) is not None
+
+    def size(self, name):
+        path = self._existing_path(name)
+        return get_file_size(path) if path else 0
+
+    def delete(self, name):
+        path = self._existing_path(name)
+        if path:
+            os.remove(path)
+
+    def send(self, name, download_name):
+        return send_file(self._existing_path(name), as_attachment=True, download_name=download_name)
+
+    def migrate(self, name):
+        """Move a file from the flat layout into its shard"""
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        os.replace(self.legacy_path(name), self.path(name))
+
+class S3Storage:
+    """Uploads in an S3-compatible bucket (AWS, MinIO, ...).
+
+    Downloads are served as redirects to short-lived presigned URLs so the
+    bytes never pass through the app workers.
+    """
+
+    def __init__(self, bucket, endpoint_url=None, prefix='', presign_expiry=300, legacy_root=None):
+        if boto3 is None:
+            raise RuntimeError('S3 storage requires the boto3 package')
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_expiry = presign_expiry
+        self.legacy_root = legacy_root
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    def key(self, name):
+        return self.prefix + shard_path(name)
+
+    def save(self, fileobj, name):
+        self.client.upload_fileobj(getattr(fileobj, 'stream', fileobj), self.bucket, self.key(name))
+
+    def open(self, name):
+        return self.client.get_object(Bucket=self.bucket, Key=self.key(name))['Body']
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def size(self, name):
+        head = self._head(name)
+        return head['ContentLength'] if head else 0
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def send(self, name, download_name):
+        url = self.client.generate_presigned_url('get_object', Params={
+            'Bucket': self.bucket,
+            'Key': self.key(name),
+            'ResponseContentDisposition': f"attachment; filename*=UTF-8''{quote(download_name)}",
+        }, ExpiresIn=self.presign_expiry)
+        return redirect(url)
+
+    def migrate(self, name):
+        """Upload a file from the local flat layout and remove the local copy"""
+        path = os.path.join(self.legacy_root, name)
+        with open(path, 'rb') as f:
+            self.client.upload_fileobj(f, self.bucket, self.key(name))
+        os.remove(path)
+
+def get_storage():
+    """Return the configured upload storage backend"""
+    if 'storage' not in app.extensions:
+        if app.config['STORAGE_BACKEND'] == 's3':
+            backend = S3Storage(app.config['S3_BUCKET'],
+                                endpoint_url=app.config['S3_ENDPOINT_URL'],
+                                prefix=app.config['S3_PREFIX'],
+                                presign_expiry=app.config['S3_PRESIGN_EXPIRY'],
+                                legacy_root=app.config['UPLOAD_FOLDER'])
+        else:
+            backend = LocalStorage(app.config['UPLOAD_FOLDER'])
+        app.extensions['storage'] = backend
+    return app.extensions['storage']
+
+storage_cli = AppGroup('storage', help='Upload storage commands.')
+
+@storage_cli.command('migrate')
+@click.option('--workers', default=8, help='Number of parallel workers.')
+@click.option('--dry-run', is_flag=True, help='Only list the files that would be moved.')
+def migrate_command(workers, dry_run):
+    """Move files from the flat uploads/ directory into the configured backend."""
+    storage = get_storage()
+    root = app.config['UPLOAD_FOLDER']
+    names = [entry.name for entry in os.scandir(root) if entry.is_file()]
+    click.echo(f"{len(names)} files in flat layout under {root}")
+    if dry_run or not names:
+        return
+
+    started = time.perf_counter()
+    moved = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(storage.migrate, name): name for name in names}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                moved += 1
+            except Exception as e:
+                failed += 1
+                app.logger.error(f"Failed to migrate {futures[future]}: {e}")
+            if (moved + failed) % 1000 == 0:
+                click.echo(f"  {moved + failed}/{len(names)}")
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Migrated {moved} files ({failed} failed) in {elapsed:.1f}s "
+               f"({moved / elapsed if elapsed else 0:.0f} files/s)")
+
+app.cli.add_command(storage_cli)
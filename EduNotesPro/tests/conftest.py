@@ -0,0 +1,28 @@
+import os
+import atexit
+import shutil
+import tempfile
+import pytest
+
+# The app configures itself from the environment on import, so point it at
+# a scratch database and folders before any test module imports it
+_scratch = tempfile.mkdtemp(prefix='edunotes-tests-')
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_scratch, 'test.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(_scratch, 'uploads')
+os.environ['STORAGE_BACKEND'] = 'local'
+os.environ['BUNDLE_CACHE_FOLDER'] = os.path.join(_scratch, 'bundle_cache')
+os.environ['RATELIMIT_BACKEND'] = 'memory'
+os.environ['MAIL_SUPPRESS_SEND'] = 'true'
+
+# Imported first, as main.py does, so the feature modules load in order
+from app import app as flask_app
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
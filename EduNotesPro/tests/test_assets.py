@@ -0,0 +1,58 @@
+import os
+import json
+import brotli
+import pytest
+import assets
+
+@pytest.fixture
+def assets_folder(app, tmp_path):
+    saved = app.config['ASSETS_FOLDER']
+    app.config['ASSETS_FOLDER'] = str(tmp_path)
+    assets._manifest = None
+    yield tmp_path
+    app.config['ASSETS_FOLDER'] = saved
+    assets._manifest = None
+
+def write_manifest(folder, manifest, mtime):
+    path = folder / 'manifest.json'
+    path.write_text(json.dumps(manifest))
+    os.utime(path, (mtime, mtime))
+
+def test_missing_manifest_is_not_cached(app, assets_folder):
+    with app.test_request_context():
+        assert assets.load_manifest() == {}
+        assert assets.asset_url('css/custom.css') == '/static/css/custom.css'
+
+        write_manifest(assets_folder, {'css/custom.css': 'css/custom.0123abcd.css'}, 1_000_000)
+        assert assets.asset_url('css/custom.css') == '/assets/css/custom.0123abcd.css'
+
+def test_manifest_is_reread_when_it_changes(assets_folder):
+    write_manifest(assets_folder, {'js/main.js': 'js/main.aaaa.js'}, 1_000_000)
+    assert assets.load_manifest() == {'js/main.js': 'js/main.aaaa.js'}
+
+    write_manifest(assets_folder, {'js/main.js': 'js/main.bbbb.js'}, 1_000_060)
+    assert assets.load_manifest() == {'js/main.js': 'js/main.bbbb.js'}
+
+def test_unreadable_manifest_falls_back_until_fixed(assets_folder):
+    (assets_folder / 'manifest.json').write_text('{"js/main.js": ')
+    assert assets.load_manifest() == {}
+
+    write_manifest(assets_folder, {'js/main.js': 'js/main.cccc.js'}, 1_000_000)
+    assert assets.load_manifest() == {'js/main.js': 'js/main.cccc.js'}
+
+def test_build_assets_updates_cache(assets_folder):
+    manifest = assets.build_assets()
+    assert set(manifest) == set(assets.ASSET_SOURCES)
+    assert assets.load_manifest() == manifest
+
+def test_build_writes_gzip_and_brotli(assets_folder):
+    manifest = assets.build_assets()
+    for built_name in manifest.values():
+        path = assets_folder / built_name
+        assert brotli.decompress((path.parent / (path.name + '.br')).read_bytes()) == path.read_bytes()
+        assert (path.parent / (path.name + '.gz')).exists()
+
+def test_dynamic_html_is_brotli_encoded(client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert b'</html>' in brotli.decompress(response.get_data())
@@ -0,0 +1,42 @@
+import click
+import pytest
+from models import Note
+from bulk_import import read_manifest
+
+def write_manifest(tmp_path, text):
+    path = tmp_path / 'manifest.csv'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+def test_missing_columns_are_a_usage_error(tmp_path):
+    manifest = write_manifest(tmp_path, 'title,semester\nAlgebra,1\n')
+    with pytest.raises(click.UsageError, match='subject_code, file_path'):
+        list(read_manifest(manifest))
+
+def test_short_and_blank_rows_become_errors(tmp_path):
+    manifest = write_manifest(tmp_path, 'title,subject_code,semester,file_path\n'
+                                        'Algebra,MATH,1,algebra.pdf\n'
+                                        'D,CS\n'
+                                        ',,,\n')
+    good, short, blank = read_manifest(manifest)
+    assert good['error'] is None and good['path'] == str(tmp_path / 'algebra.pdf')
+    assert short == {'path': 'manifest.csv line 3', 'error': 'row has no semester, file_path'}
+    assert blank == {'path': 'manifest.csv line 4', 'error': 'missing file_path'}
+
+def test_bad_rows_do_not_abort_the_import(app, tmp_path):
+    (tmp_path / 'optics.pdf').write_bytes(b'%PDF-1.4 bulk import test\n')
+    manifest = write_manifest(tmp_path, 'title,subject_code,semester,file_path,description\n'
+                                        'Optics,PHY,2,optics.pdf,Lenses\n'
+                                        'D,CS\n')
+    result = app.test_cli_runner().invoke(args=['notes', 'import', manifest])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 1, skipped 0, failed 1' in result.output
+    assert 'manifest.csv line 3: row has no semester, file_path' in result.output
+    with app.app_context():
+        assert Note.query.filter_by(title='Optics', description='Lenses').count() == 1
+
+def test_manifest_without_columns_fails_cleanly(app, tmp_path):
+    manifest = write_manifest(tmp_path, 'name,path\nAlgebra,algebra.pdf\n')
+    result = app.test_cli_runner().invoke(args=['notes', 'import', manifest])
+    assert result.exit_code == 2
+    assert 'missing column(s): title, subject_code, semester, file_path' in result.output
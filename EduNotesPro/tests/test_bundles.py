@@ -0,0 +1,139 @@
+import io
+import os
+import zipfile
+from datetime import datetime
+import pytest
+from app import db
+from models import Note, Subject, Download
+from storage import get_storage
+from bundles import bundle_files, bundle_etag, stream_zip, cache_path_for, prune_cache
+
+SEMESTER = 7
+
+@pytest.fixture
+def bundle_env(app, tmp_path):
+    """Scratch storage and bundle cache, with rate limiting off"""
+    saved = (app.config['UPLOAD_FOLDER'], app.config['BUNDLE_CACHE_FOLDER'],
+             app.config['RATELIMIT_ENABLED'], app.extensions.pop('storage', None))
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    app.config['BUNDLE_CACHE_FOLDER'] = str(tmp_path / 'cache')
+    app.config['RATELIMIT_ENABLED'] = False
+    os.makedirs(app.config['BUNDLE_CACHE_FOLDER'])
+    yield tmp_path
+    (app.config['UPLOAD_FOLDER'], app.config['BUNDLE_CACHE_FOLDER'],
+     app.config['RATELIMIT_ENABLED'], storage) = saved
+    app.extensions.pop('storage', None)
+    if storage is not None:
+        app.extensions['storage'] = storage
+
+@pytest.fixture
+def bundle_notes(app, bundle_env):
+    """Approved notes for one subject/semester: two PDFs sharing a name, a DOC and a missing file"""
+    contents = {
+        'lecture-1.pdf': os.urandom(600 * 1024),
+        'lecture-2.pdf': b'%PDF-1.4 second lecture\n',
+        'summary.doc': b'plain text summary ' * 200,
+    }
+    storage = get_storage()
+    for name, data in contents.items():
+        storage.save(io.BytesIO(data), name)
+
+    with app.app_context():
+        subject = Subject.query.filter_by(code='EC').one()
+        specs = [('lecture-1.pdf', 'Lecture.pdf'), ('lecture-2.pdf', 'Lecture.pdf'),
+                 ('summary.doc', 'Summary.doc'), ('gone.pdf', 'Gone.pdf')]
+        notes = []
+        for filename, original in specs:
+            notes.append(Note(title=original, filename=filename, original_filename=original,
+                              file_size=len(contents.get(filename, b'')), semester=SEMESTER,
+                              upload_date=datetime(2026, 2, 3, 4, 5, 6), is_approved=True,
+                              download_count=0, user_id=1, subject_id=subject.id))
+        db.session.add_all(notes)
+        db.session.commit()
+        ids = [note.id for note in notes]
+        yield subject.id, ids, contents
+
+        Download.query.filter(Download.note_id.in_(ids)).delete()
+        Note.query.filter(Note.id.in_(ids)).delete()
+        db.session.commit()
+
+def load_files(ids):
+    return bundle_files(Note.query.filter(Note.id.in_(ids)).order_by(Note.id).all())
+
+def test_stream_zip_builds_valid_archive(app, bundle_notes):
+    subject_id, ids, contents = bundle_notes
+    with app.app_context():
+        files = load_files(ids)
+    cache_path = cache_path_for(subject_id, SEMESTER, bundle_etag(files))
+    data = b''.join(stream_zip(files, cache_path))
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    assert archive.namelist() == ['Lecture.pdf', 'Lecture (2).pdf', 'Summary.doc']
+    assert archive.read('Lecture.pdf') == contents['lecture-1.pdf']
+    assert archive.read('Summary.doc') == contents['summary.doc']
+    # PDFs are stored as-is, other formats deflated
+    assert archive.getinfo('Lecture (2).pdf').compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo('Summary.doc').compress_type == zipfile.ZIP_DEFLATED
+    assert archive.getinfo('Lecture.pdf').date_time == (2026, 2, 3, 4, 5, 6)
+
+    with open(cache_path, 'rb') as f:
+        assert f.read() == data
+    assert os.listdir(os.path.dirname(cache_path)) == [os.path.basename(cache_path)]
+
+def test_closing_stream_midway_removes_partial_cache(app, bundle_notes):
+    subject_id, ids, _ = bundle_notes
+    with app.app_context():
+        files = load_files(ids)
+    cache_path = cache_path_for(subject_id, SEMESTER, bundle_etag(files))
+    stream = stream_zip(files, cache_path)
+    next(stream)
+    assert any(name.endswith('.tmp') for name in os.listdir(os.path.dirname(cache_path)))
+    stream.close()
+    assert os.listdir(os.path.dirname(cache_path)) == []
+
+def test_prune_cache_keeps_current_and_in_progress_bundles(app, bundle_env):
+    with app.app_context():
+        keep = cache_path_for(3, 4, 'current')
+    folder = os.path.dirname(keep)
+    names = ['3-4-current.zip', '3-4-stale.zip', '3-4-other.zip.abc.tmp', '3-5-stale.zip', '13-4-stale.zip']
+    for name in names:
+        open(os.path.join(folder, name), 'wb').close()
+    prune_cache(3, 4, keep)
+    assert sorted(os.listdir(folder)) == sorted(set(names) - {'3-4-stale.zip'})
+
+def download_count(ids):
+    return Download.query.filter(Download.note_id.in_(ids)).count()
+
+def test_download_bundle_route(app, client, bundle_notes):
+    subject_id, ids, _ = bundle_notes
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    url = f'/download/bundle?subject_id={subject_id}&semester={SEMESTER}'
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    assert response.headers['Content-Disposition'] == f'attachment; filename="EC-semester-{SEMESTER}.zip"'
+    etag = response.headers['ETag']
+    streamed = response.get_data()
+    assert zipfile.ZipFile(io.BytesIO(streamed)).testzip() is None
+    with app.app_context():
+        assert download_count(ids) == 4
+        assert [note.download_count for note in Note.query.filter(Note.id.in_(ids))] == [1, 1, 1, 1]
+
+    # The browser's copy is current: no body and no new downloads
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    with app.app_context():
+        assert download_count(ids) == 4
+
+    # Served from the cache this time, byte for byte the same
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['ETag'] == etag
+    assert response.get_data() == streamed
+    response.close()
+    with app.app_context():
+        assert download_count(ids) == 8
@@ -0,0 +1,18 @@
+from datetime import datetime
+from exports import csv_value, write_csv, write_ndjson
+
+def test_csv_value():
+    assert csv_value(None) == ''
+    assert csv_value(datetime(2026, 1, 2, 3, 4)) == '2026-01-02T03:04:00'
+    assert csv_value(True) == 1
+    assert csv_value(-5) == -5
+    assert csv_value('Calculus notes') == 'Calculus notes'
+
+def test_csv_escapes_formulas():
+    for value in ('=HYPERLINK("http://example.com")', '+1', '-2+3', '@SUM(A1)', '\tx'):
+        assert csv_value(value) == "'" + value
+    output = ''.join(write_csv(['title'], [('=1+1',)]))
+    assert output.splitlines()[1] == "'=1+1"
+
+def test_ndjson_is_not_escaped():
+    assert ''.join(write_ndjson(['title', 'views'], [('=1+1', -3)])) == '{"title": "=1+1", "views": -3}\n'
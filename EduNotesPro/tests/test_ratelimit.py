@@ -0,0 +1,104 @@
+import pytest
+from ratelimit import (Rule, parse_rule, parse_rules, refill, take_token,
+                       MemoryBackend, SQLiteBackend)
+
+def test_parse_rule():
+    assert parse_rule('30/minute') == Rule(30, 0.5)
+    assert parse_rule('10/seconds') == Rule(10, 10)
+    assert parse_rules('login=10/minute; search=60/hour') == {
+        'login': Rule(10, 10 / 60), 'search': Rule(60, 60 / 3600)}
+
+def test_refill_adds_elapsed_tokens_up_to_capacity():
+    rule = Rule(10, 2.0)
+    assert refill(0, 100.0, 101.5, rule) == 3.0
+    assert refill(9, 100.0, 200.0, rule) == 10
+    # Clock going backwards never removes tokens
+    assert refill(4, 100.0, 99.0, rule) == 4
+
+def test_take_token():
+    rule = Rule(5, 0.5)
+    tokens, decision = take_token(3.0, rule)
+    assert tokens == 2.0
+    assert decision.allowed and decision.remaining == 2 and decision.retry_after == 0
+
+    tokens, decision = take_token(0.5, rule)
+    assert tokens == 0.5
+    assert not decision.allowed
+    # Half a token missing at 0.5 tokens per second
+    assert decision.retry_after == pytest.approx(1.0)
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    return SQLiteBackend(str(tmp_path / 'ratelimit.db'))
+
+def test_backend_allows_burst_then_refills(backend):
+    rule = Rule(3, 1.0)
+    now = 1000.0
+    assert [backend.take('k', rule, now).allowed for _ in range(4)] == [True, True, True, False]
+    assert backend.take('k', rule, now).retry_after == pytest.approx(1.0)
+    # Other clients have their own bucket
+    assert backend.take('other', rule, now).allowed
+    assert backend.take('k', rule, now + 1.0).allowed
+    assert not backend.take('k', rule, now + 1.0).allowed
+
+@pytest.fixture
+def limited(app):
+    """Tight limits on rate_note and login, restored afterwards"""
+    saved = (app.config['RATELIMIT_ENABLED'], app.extensions.get('ratelimit_rules'),
+             app.extensions.get('ratelimit_backend'))
+    app.config['RATELIMIT_ENABLED'] = True
+    app.extensions['ratelimit_rules'] = {'rate_note': Rule(1, 0.01), 'login': Rule(1, 0.01)}
+    app.extensions['ratelimit_backend'] = MemoryBackend()
+    yield app
+    app.config['RATELIMIT_ENABLED'], rules, backend = saved
+    for key, value in (('ratelimit_rules', rules), ('ratelimit_backend', backend)):
+        if value is None:
+            app.extensions.pop(key, None)
+        else:
+            app.extensions[key] = value
+
+def test_json_endpoint_gets_json_429(limited, client):
+    assert client.post('/rate_note').status_code == 200
+    response = client.post('/rate_note')
+    assert response.status_code == 429
+    assert response.is_json and response.json['success'] is False
+    assert response.headers['Retry-After'] == '100'
+    assert 'ratelimit;dur=' in response.headers['Server-Timing']
+
+def test_html_endpoint_gets_429_page(limited, client):
+    client.post('/login', data={'email': 'nobody@example.com', 'password': 'x'})
+    response = client.post('/login', data={'email': 'nobody@example.com', 'password': 'x'})
+    assert response.status_code == 429
+    assert response.mimetype == 'text/html'
+    assert 'Retry-After' in response.headers
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+def test_accounts_share_the_ip_bucket(limited, client):
+    limited.extensions['ratelimit_rules']['rate_note'] = Rule(2, 0.01)
+    log_in(client, 1)
+    assert client.post('/rate_note').status_code == 200
+    assert client.post('/rate_note').status_code == 200
+    # A second account from the same address finds the IP bucket empty
+    log_in(client, 2)
+    response = client.post('/rate_note')
+    assert response.status_code == 429
+    assert response.headers['X-RateLimit-Remaining'] == '0'
+
+def test_user_bucket_applies_across_addresses(limited, client):
+    log_in(client, 1)
+    assert client.post('/rate_note', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 200
+    assert client.post('/rate_note', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 429
+
+def test_fails_open_when_backend_errors(limited, client):
+    class BrokenBackend:
+        def take(self, key, rule, now):
+            raise ConnectionError('backend down')
+
+    limited.extensions['ratelimit_backend'] = BrokenBackend()
+    for _ in range(3):
+        assert client.post('/rate_note').status_code == 200
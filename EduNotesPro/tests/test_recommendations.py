@@ -0,0 +1,105 @@
+from datetime import datetime
+import numpy as np
+import pytest
+from app import db
+from models import User, Note, Subject, Download, NoteRecommendation
+from recommender import build_download_matrix, top_k_similar, rebuild_recommendations
+
+# user -> notes downloaded. Notes 0 and 1 have 3 downloaders, notes 2 and
+# 3 have 2; co-downloads are 0-1 and 0-2 twice, 0-3, 1-2 and 2-3 once
+DOWNLOADS = {0: [0, 1, 2], 1: [0, 1], 2: [0, 2, 3], 3: [3], 4: [1]}
+
+COS_01 = 2 / np.sqrt(3 * 3)
+COS_02 = 2 / np.sqrt(3 * 2)
+COS_03 = COS_12 = 1 / np.sqrt(3 * 2)
+COS_23 = 1 / np.sqrt(2 * 2)
+
+@pytest.fixture
+def matrix():
+    pairs = [(user, note) for user, notes in DOWNLOADS.items() for note in notes]
+    pairs.append((0, 0))  # Repeat downloads count once
+    user_ids, note_ids = (np.array(column) for column in zip(*pairs))
+    matrix, column_note_ids = build_download_matrix(user_ids, note_ids)
+    assert list(column_note_ids) == [0, 1, 2, 3]
+    return matrix
+
+def similar(matrix, top_k=10, eligible=None, subjects=(0, 0, 0, 0), semesters=(1, 1, 1, 1), **weights):
+    eligible = np.ones(4, dtype=bool) if eligible is None else np.array(eligible)
+    results = top_k_similar(matrix, np.array(subjects), np.array(semesters), eligible, top_k, **weights)
+    return {row: [(col, pytest.approx(score)) for col, score in pairs] for row, pairs in results}
+
+def test_cosine_scores_exclude_the_note_itself(matrix):
+    assert similar(matrix) == {
+        0: [(2, COS_02), (1, COS_01), (3, COS_03)],
+        1: [(0, COS_01), (2, COS_12)],
+        2: [(0, COS_02), (3, COS_23), (1, COS_12)],
+        3: [(2, COS_23), (0, COS_03)],
+    }
+
+def test_ineligible_notes_are_never_recommended(matrix):
+    result = similar(matrix, eligible=[True, False, True, True])
+    assert all(col != 1 for pairs in result.values() for col, _ in pairs)
+    # An unapproved note still gets its own list
+    assert result[1] == [(0, COS_01), (2, COS_12)]
+    assert result[0] == [(2, COS_02), (3, COS_03)]
+
+def test_subject_and_semester_boosts(matrix):
+    result = similar(matrix, subjects=(5, 6, 6, 5), subject_weight=1.5)
+    assert result[0] == [(3, COS_03 * 2.5), (2, COS_02), (1, COS_01)]
+    result = similar(matrix, semesters=(1, 1, 2, 2), semester_weight=0.5)
+    assert result[0] == [(1, COS_01 * 1.5), (2, COS_02), (3, COS_03)]
+
+def test_top_k_and_selected_rows(matrix):
+    assert similar(matrix, top_k=1) == {0: [(2, COS_02)], 1: [(0, COS_01)], 2: [(0, COS_02)], 3: [(2, COS_23)]}
+    assert list(top_k_similar(matrix, np.zeros(4), np.zeros(4), np.ones(4, dtype=bool), 10, rows=[3])) \
+        == [(3, [(2, pytest.approx(COS_23)), (0, pytest.approx(COS_03))])]
+
+@pytest.fixture
+def download_history(app):
+    """Users and approved notes with the DOWNLOADS history, dated in the past"""
+    with app.app_context():
+        subject_id = Subject.query.filter_by(code='CS').one().id
+        users = [User(username=f'recommender-{i}', email=f'recommender-{i}@example.com', password_hash='x')
+                 for i in range(len(DOWNLOADS))]
+        notes = [Note(title=f'recommender {i}', filename=f'recommender-{i}.pdf', original_filename='r.pdf',
+                      semester=1, is_approved=True, user_id=1, subject_id=subject_id) for i in range(5)]
+        db.session.add_all(users + notes)
+        db.session.flush()
+        history = {**DOWNLOADS, 3: [3, 4]}
+        db.session.add_all(Download(user_id=users[user].id, note_id=notes[note].id,
+                                    download_date=datetime(2026, 1, 1))
+                           for user, note_indexes in history.items() for note in note_indexes)
+        db.session.commit()
+        yield users, notes
+
+        note_ids = [note.id for note in notes]
+        NoteRecommendation.query.delete()
+        Download.query.filter(Download.note_id.in_(note_ids)).delete()
+        Note.query.filter(Note.id.in_(note_ids)).delete()
+        User.query.filter(User.id.in_([user.id for user in users])).delete()
+        db.session.commit()
+
+def related_ids(note):
+    rows = NoteRecommendation.query.filter_by(note_id=note.id).order_by(NoteRecommendation.rank)
+    return [row.related_note_id for row in rows]
+
+def build_times():
+    return dict(db.session.query(NoteRecommendation.note_id, db.func.max(NoteRecommendation.created_at))
+                .group_by(NoteRecommendation.note_id))
+
+def test_incremental_rebuild_recomputes_affected_notes(download_history):
+    users, notes = download_history
+    assert rebuild_recommendations()['notes'] == 5
+    assert rebuild_recommendations(incremental=True)['notes'] == 0
+    assert related_ids(notes[1]) == [notes[0].id, notes[2].id]
+    first_build = build_times()
+
+    # User 1 (who had downloaded notes 0 and 1) now downloads note 4
+    db.session.add(Download(user_id=users[1].id, note_id=notes[4].id, download_date=datetime.utcnow()))
+    db.session.commit()
+    stats = rebuild_recommendations(incremental=True)
+
+    assert stats['notes'] == 3
+    rebuilt = {note_id for note_id, built in build_times().items() if built != first_build[note_id]}
+    assert rebuilt == {notes[0].id, notes[1].id, notes[4].id}
+    assert notes[4].id in related_ids(notes[1])
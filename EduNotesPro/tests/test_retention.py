@@ -0,0 +1,55 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import pytest
+from retention import write_partition, read_summary, read_archived_downloads, part_files, partition_path
+
+Row = namedtuple('Row', ['id', 'user_id', 'note_id', 'download_date'])
+
+MONTH = '2025-03'
+
+def make_rows(ids):
+    start = datetime(2025, 3, 1)
+    return [Row(i, 1, 1, start + timedelta(hours=i)) for i in ids]
+
+@pytest.fixture
+def archive_folder(app, tmp_path):
+    saved = app.config['DOWNLOAD_ARCHIVE_FOLDER']
+    app.config['DOWNLOAD_ARCHIVE_FOLDER'] = str(tmp_path)
+    yield tmp_path
+    app.config['DOWNLOAD_ARCHIVE_FOLDER'] = saved
+
+def archive_in_batches(ids, batch_size):
+    for i in range(0, len(ids), batch_size):
+        write_partition(MONTH, make_rows(ids[i:i + batch_size]))
+
+def archived_ids():
+    return sorted(row['id'] for row in read_archived_downloads())
+
+def summary_total():
+    return sum(sum(daily.values()) for daily in read_summary(MONTH).values())
+
+def test_rerun_with_other_batch_size_does_not_double_count(archive_folder):
+    # A run with --batch-size 100 wrote its part, then crashed before
+    # deleting the rows, so the rerun archives them again in batches of 30
+    archive_in_batches(list(range(1, 101)), 100)
+    archive_in_batches(list(range(1, 121)), 30)
+
+    assert archived_ids() == list(range(1, 121))
+    assert summary_total() == 120
+    assert sorted(read_summary(MONTH)) == part_files(partition_path(MONTH))
+
+def test_rerun_with_same_batch_overwrites_part(archive_folder):
+    archive_in_batches(list(range(1, 51)), 50)
+    archive_in_batches(list(range(1, 51)), 50)
+
+    assert archived_ids() == list(range(1, 51))
+    assert summary_total() == 50
+
+def test_overlapping_committed_part_is_kept(archive_folder):
+    # Ids do not follow download dates, so a later run can archive ids
+    # inside the range of a part whose rows were already deleted
+    archive_in_batches(list(range(1, 100, 2)), 50)
+    archive_in_batches(list(range(2, 101, 2)), 50)
+
+    assert archived_ids() == list(range(1, 101))
+    assert summary_total() == 100
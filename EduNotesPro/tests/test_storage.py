@@ -0,0 +1,125 @@
+import os
+import io
+import hashlib
+import urllib.request
+from urllib.parse import urlsplit, parse_qs
+import pytest
+from storage import shard_path, LocalStorage, S3Storage
+
+# S3 tests run against moto's in-process fake unless TEST_S3_ENDPOINT_URL
+# points at a real S3-compatible server such as MinIO, e.g.
+#   TEST_S3_ENDPOINT_URL=http://localhost:9000 AWS_ACCESS_KEY_ID=minioadmin \
+#   AWS_SECRET_ACCESS_KEY=minioadmin python -m pytest tests/test_storage.py
+S3_ENDPOINT_URL = os.environ.get('TEST_S3_ENDPOINT_URL')
+
+def test_shard_path():
+    digest = hashlib.sha1(b'notes.pdf').hexdigest()
+    assert shard_path('notes.pdf') == f'{digest[:2]}/{digest[2:4]}/notes.pdf'
+    assert shard_path('notes.pdf', depth=1) == f'{digest[:2]}/notes.pdf'
+    assert shard_path('notes.pdf') == shard_path('notes.pdf')
+    # Names spread over many directories
+    assert len({shard_path(f'{i}.pdf').split('/')[0] for i in range(200)}) > 100
+
+def test_local_storage_saves_into_shards(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.save(io.BytesIO(b'sharded'), 'a.pdf')
+    assert (tmp_path / shard_path('a.pdf')).read_bytes() == b'sharded'
+    assert storage.exists('a.pdf') and storage.size('a.pdf') == 7
+    storage.delete('a.pdf')
+    assert not storage.exists('a.pdf')
+
+def test_local_storage_reads_legacy_flat_layout(app, tmp_path):
+    (tmp_path / 'old.pdf').write_bytes(b'flat layout')
+    storage = LocalStorage(str(tmp_path))
+    assert storage.exists('old.pdf')
+    assert storage.size('old.pdf') == 11
+    with storage.open('old.pdf') as f:
+        assert f.read() == b'flat layout'
+    with app.test_request_context():
+        response = storage.send('old.pdf', 'Old Notes.pdf')
+        response.direct_passthrough = False
+        assert response.get_data() == b'flat layout'
+        assert 'attachment' in response.headers['Content-Disposition']
+        response.close()
+
+    storage.migrate('old.pdf')
+    assert not (tmp_path / 'old.pdf').exists()
+    assert (tmp_path / shard_path('old.pdf')).read_bytes() == b'flat layout'
+    assert storage.exists('old.pdf')
+
+@pytest.fixture
+def upload_folder(app, tmp_path):
+    saved = app.config['UPLOAD_FOLDER'], app.extensions.pop('storage', None)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    yield tmp_path
+    app.config['UPLOAD_FOLDER'], storage = saved
+    app.extensions.pop('storage', None)
+    if storage is not None:
+        app.extensions['storage'] = storage
+
+def test_migrate_command_moves_flat_files(app, upload_folder):
+    for i in range(5):
+        (upload_folder / f'{i}.pdf').write_bytes(b'x' * i)
+    result = app.test_cli_runner().invoke(args=['storage', 'migrate', '--workers', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Migrated 5 files (0 failed)' in result.output
+    assert not any(entry.is_file() for entry in os.scandir(upload_folder))
+    for i in range(5):
+        assert (upload_folder / shard_path(f'{i}.pdf')).read_bytes() == b'x' * i
+
+@pytest.fixture
+def s3_storage(monkeypatch, tmp_path):
+    boto3 = pytest.importorskip('boto3')
+    if S3_ENDPOINT_URL:
+        mock = None
+    else:
+        moto = pytest.importorskip('moto')
+        for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+            monkeypatch.setenv(name, 'testing')
+        mock = moto.mock_aws()
+        mock.start()
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+    bucket = f'edunotes-test-{os.getpid()}'
+    boto3.client('s3', endpoint_url=S3_ENDPOINT_URL).create_bucket(Bucket=bucket)
+    storage = S3Storage(bucket, endpoint_url=S3_ENDPOINT_URL, prefix='uploads/', legacy_root=str(tmp_path))
+    yield storage
+
+    for item in storage.client.list_objects_v2(Bucket=bucket).get('Contents', []):
+        storage.client.delete_object(Bucket=bucket, Key=item['Key'])
+    storage.client.delete_bucket(Bucket=bucket)
+    if mock is not None:
+        mock.stop()
+
+def test_s3_storage_round_trip(s3_storage):
+    s3_storage.save(io.BytesIO(b'in the bucket'), 'b.pdf')
+    assert s3_storage.exists('b.pdf')
+    assert s3_storage.size('b.pdf') == 13
+    assert s3_storage.open('b.pdf').read() == b'in the bucket'
+    head = s3_storage.client.head_object(Bucket=s3_storage.bucket, Key='uploads/' + shard_path('b.pdf'))
+    assert head['ContentLength'] == 13
+
+    s3_storage.delete('b.pdf')
+    assert not s3_storage.exists('b.pdf')
+    assert s3_storage.size('b.pdf') == 0
+
+def test_s3_send_redirects_to_presigned_url(app, s3_storage):
+    s3_storage.save(io.BytesIO(b'presigned'), 'c.pdf')
+    with app.test_request_context():
+        response = s3_storage.send('c.pdf', 'Lecture 1 notes.pdf')
+    assert response.status_code == 302
+    url = response.headers['Location']
+    parts = urlsplit(url)
+    assert parts.path.endswith('/uploads/' + shard_path('c.pdf'))
+    query = parse_qs(parts.query)
+    assert query['response-content-disposition'] == ["attachment; filename*=UTF-8''Lecture%201%20notes.pdf"]
+    assert query.get('X-Amz-Expires', query.get('Expires')) is not None
+    if S3_ENDPOINT_URL:
+        with urllib.request.urlopen(url) as download:
+            assert download.read() == b'presigned'
+
+def test_s3_migrate_uploads_and_removes_local_copy(s3_storage, tmp_path):
+    (tmp_path / 'd.pdf').write_bytes(b'legacy file')
+    s3_storage.migrate('d.pdf')
+    assert not (tmp_path / 'd.pdf').exists()
+    assert s3_storage.open('d.pdf').read() == b'legacy file'
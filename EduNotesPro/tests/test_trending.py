@@ -0,0 +1,76 @@
+import math
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from app import db
+from models import Note
+from trending import log2_add, record_event, current_score, trending_notes, EPOCH
+
+def test_log2_add():
+    assert log2_add(None, 3.0) == 3.0
+    assert log2_add(3.0, None) == 3.0
+    assert log2_add(3.0, 3.0) == pytest.approx(4.0)
+    assert log2_add(1.0, 5.0) == pytest.approx(math.log2(2 ** 1 + 2 ** 5))
+    assert log2_add(1.0, 5.0) == log2_add(5.0, 1.0)
+
+def test_log2_add_does_not_overflow():
+    # 2 ** 5000 is far beyond float range
+    assert log2_add(5000.0, 5000.0) == pytest.approx(5001.0)
+    assert log2_add(5000.0, 10.0) == pytest.approx(5000.0)
+
+def test_current_score_counts_fresh_events(app):
+    now = datetime(2026, 3, 1)
+    note = SimpleNamespace(trending_score=None)
+    assert current_score(note, now) == 0
+    for _ in range(3):
+        record_event(note, 1.0, now)
+    assert current_score(note, now) == pytest.approx(3.0)
+
+def test_current_score_halves_every_half_life(app):
+    half_life = timedelta(hours=app.config['TRENDING_HALF_LIFE_HOURS'])
+    when = EPOCH + timedelta(days=400)
+    note = SimpleNamespace(trending_score=None)
+    record_event(note, 4.0, when)
+    assert current_score(note, when + half_life) == pytest.approx(2.0)
+    assert current_score(note, when + 3 * half_life) == pytest.approx(0.5)
+
+def test_newer_events_outrank_older_ones(app):
+    old, new = SimpleNamespace(trending_score=None), SimpleNamespace(trending_score=None)
+    start = datetime(2026, 1, 1)
+    for _ in range(4):
+        record_event(old, 1.0, start)
+    record_event(new, 1.0, start + timedelta(hours=app.config['TRENDING_HALF_LIFE_HOURS'] * 3))
+    # Four events three half-lives ago are worth half of one event now
+    assert new.trending_score > old.trending_score
+
+def test_non_positive_weights_are_ignored(app):
+    note = SimpleNamespace(trending_score=None)
+    record_event(note, 0, datetime(2026, 1, 1))
+    assert note.trending_score is None
+
+@pytest.fixture
+def scored_notes(app):
+    """Approved notes with (trending score, downloads), plus one unapproved"""
+    specs = [(3.0, 1), (9.0, 0), (None, 50), (None, 70), (5.0, 2), (None, 10)]
+    with app.app_context():
+        # The test database is shared, so rank only these notes
+        Note.query.filter_by(is_approved=True).update({'is_approved': False})
+        notes = []
+        for i, (score, downloads) in enumerate(specs):
+            notes.append(Note(title=f'trending {i}', filename=f'trending-{i}.pdf', original_filename='t.pdf',
+                              semester=1, user_id=1, subject_id=1, is_approved=True,
+                              trending_score=score, download_count=downloads))
+        notes.append(Note(title='unapproved', filename='trending-x.pdf', original_filename='t.pdf',
+                          semester=1, user_id=1, subject_id=1, is_approved=False,
+                          trending_score=99.0, download_count=999))
+        db.session.add_all(notes)
+        db.session.commit()
+        yield
+        for note in notes:
+            db.session.delete(note)
+        db.session.commit()
+
+def test_trending_notes_ranks_scored_notes_first(scored_notes):
+    assert [note.title for note in trending_notes(4)] == ['trending 1', 'trending 4', 'trending 0', 'trending 3']
+    assert [note.title for note in trending_notes(2)] == ['trending 1', 'trending 4']
+    assert len(trending_notes(10)) == 6
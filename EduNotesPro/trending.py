@@ -0,0 +1,115 @@
+import math
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, desc, update
+from app import app, db
+from models import Note, Download, Rating
+
+# Scores are stored as log2 of the decayed sum, scaled to this fixed epoch.
+# Every event is weighted by 2 ** (age_since_epoch / half_life), so older
+# events automatically count for less relative to newer ones and the stored
+# values never need to be decayed in place. Ordering by the stored column is
+# therefore always the current trending order, and a plain index serves it.
+EPOCH = datetime(2024, 1, 1)
+
+def half_lives_since_epoch(when):
+    """Number of half-lives between EPOCH and the given time"""
+    half_life = app.config['TRENDING_HALF_LIFE_HOURS'] * 3600
+    return (when - EPOCH).total_seconds() / half_life
+
+def log2_add(a, b):
+    """Return log2(2**a + 2**b) without overflowing"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+def event_score(weight, when):
+    return math.log2(weight) + half_lives_since_epoch(when)
+
+def record_event(note, weight, when=None):
+    """Add a weighted event to a note's trending score (caller commits)"""
+    if weight <= 0:
+        return
+    note.trending_score = log2_add(note.trending_score, event_score(weight, when or datetime.utcnow()))
+
+def record_download(note, when=None):
+    record_event(note, app.config['TRENDING_DOWNLOAD_WEIGHT'], when)
+
+def record_rating(note, score, when=None):
+    record_event(note, app.config['TRENDING_RATING_WEIGHT'] * score / 5, when)
+
+def current_score(note, now=None):
+    """Decayed score as of now, i.e. the weighted event count"""
+    if note.trending_score is None:
+        return 0
+    return 2 ** (note.trending_score - half_lives_since_epoch(now or datetime.utcnow()))
+
+def trending_notes(limit=6):
+    """Top approved notes by trending score, falling back to all-time downloads.
+
+    Scored notes come first, in ix_note_approved_trending order; leaving out
+    NULL scores lets PostgreSQL read that index backwards instead of sorting
+    (a backward scan yields NULLS FIRST). Notes never scored only fill up a
+    short list.
+    """
+    approved = Note.query.filter_by(is_approved=True)
+    notes = approved.filter(Note.trending_score.isnot(None)) \
+        .order_by(Note.trending_score.desc()) \
+        .limit(limit).all()
+    if len(notes) < limit:
+        notes += approved.filter(Note.trending_score.is_(None)) \
+            .order_by(desc(Note.download_count)) \
+            .limit(limit - len(notes)).all()
+    return notes
+
+def rebuild_trending_scores(chunk_size=10000):
+    """Recompute every note's score from the Download and Rating history.
+
+    Needed after changing TRENDING_HALF_LIFE_HOURS or the event weights.
+    """
+    scores = {}
+    download_weight = app.config['TRENDING_DOWNLOAD_WEIGHT']
+    rating_weight = app.config['TRENDING_RATING_WEIGHT']
+
+    downloads = db.session.execute(
+        select(Download.note_id, Download.download_date).execution_options(yield_per=chunk_size)
+    )
+    for note_id, when in downloads:
+        scores[note_id] = log2_add(scores.get(note_id), event_score(download_weight, when or EPOCH))
+
+    ratings = db.session.execute(
+        select(Rating.note_id, Rating.score, Rating.created_at).execution_options(yield_per=chunk_size)
+    )
+    for note_id, score, when in ratings:
+        if score > 0:
+            scores[note_id] = log2_add(scores.get(note_id),
+                                       event_score(rating_weight * score / 5, when or EPOCH))
+
+    db.session.execute(update(Note).values(trending_score=None))
+    rows = [{'id': note_id, 'trending_score': score} for note_id, score in scores.items()]
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(update(Note), rows[start:start + chunk_size])
+    db.session.commit()
+    return len(rows)
+
+trending_cli = AppGroup('trending', help='Trending score commands.')
+
+@trending_cli.command('rebuild')
+def rebuild_command():
+    """Recompute trending scores from download and rating history."""
+    count = rebuild_trending_scores()
+    click.echo(f"Rebuilt trending scores for {count} notes")
+
+@trending_cli.command('top')
+@click.option('--limit', default=10, help='Number of notes to show.')
+def top_command(limit):
+    """Show the current top trending notes."""
+    now = datetime.utcnow()
+    for note in trending_notes(limit):
+        click.echo(f"{current_score(note, now):10.2f}  {note.id:>6}  {note.title}")
+
+app.cli.add_command(trending_cli)